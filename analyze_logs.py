@@ -4,58 +4,224 @@ Log analysis utility for battery monitoring system
 Analyzes voltage trends, charging patterns, and solar activity
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+# numpy stays a top-level import: VoltageLog and every analysis below are built on it
+import numpy as np
+from dataclasses import dataclass, fields, replace
 from datetime import datetime, timedelta
 import sys
 import os
+from config import PREFERRED_HOURS_MASK, AVOID_HOURS_MASK, HOLIDAYS
+from history_dataset import dataset_dir_for, parse_history_csv, read_dataset, record_seconds, sync_dataset
 
-def load_voltage_data(csv_file):
-    """Load voltage data from CSV file"""
+# Columns the analyses below actually read (projected when loading Parquet)
+ANALYSIS_COLUMNS = [
+    'timestamp', 'voltage', 'charger_connected', 'solar_detected',
+    'in_preferred_hours', 'in_avoid_hours', 'charging_decision'
+]
+
+@dataclass
+class VoltageLog:
+    """Voltage history stored column-wise: one numpy array per CSV column"""
+    timestamp: np.ndarray
+    voltage: np.ndarray
+    charger_connected: np.ndarray
+    solar_detected: np.ndarray
+    in_preferred_hours: np.ndarray
+    in_avoid_hours: np.ndarray
+    charging_decision: np.ndarray  # integer codes into decision_labels
+    hour: np.ndarray
+    seconds: np.ndarray  # Monitoring time each row covers (rows are unevenly spaced)
+    decision_labels: np.ndarray  # code -> decision text, shared by every slice
+    
+    def __len__(self):
+        return len(self.timestamp)
+    
+    def take(self, index):
+        """New log holding the rows selected by a slice, mask or index array"""
+        return replace(self, **{
+            f.name: getattr(self, f.name)[index]
+            for f in fields(self) if f.name != 'decision_labels'
+        })
+
+def hour_of_day(timestamps):
+    """Hour (0-23) of each datetime64 value, via integer arithmetic"""
+    return (timestamps.astype('datetime64[h]').astype('int64') % 24).astype(np.int8)
+
+def in_hour_mask(hours, mask):
+    """Which hour-of-day values (0-23) have their bit set in a config hour mask"""
+    return ((mask >> hours.astype(np.int64)) & 1).astype(bool)
+
+def is_weekend(timestamps):
+    """Saturday/Sunday flag for each datetime64 value"""
+    days = timestamps.astype('datetime64[D]').astype('int64')
+    return (days + 3) % 7 >= 5  # 1970-01-01 was a Thursday (weekday 3)
+
+def is_holiday(timestamps):
+    """Flag for each datetime64 value falling on one of the configured HOLIDAYS"""
+    return np.isin(timestamps.astype('datetime64[D]'), np.array(HOLIDAYS, dtype='datetime64[D]'))
+
+def load_voltage_data(csv_file, columns=None):
+    """Load voltage data from CSV file (through the shared Parquet dataset when pyarrow is available)"""
     try:
-        df = pd.read_csv(csv_file)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        return df
+        data = read_history(csv_file, columns)
+        timestamps = np.asarray(data['timestamp'], dtype='datetime64[us]')
+        return VoltageLog(
+            timestamp=timestamps,
+            # Readings carry ~3 significant digits; float32 halves the bandwidth
+            voltage=np.asarray(data['voltage'], dtype=np.float32),
+            charger_connected=np.asarray(data['charger_connected'], dtype=bool),
+            solar_detected=np.asarray(data['solar_detected'], dtype=bool),
+            in_preferred_hours=np.asarray(data['in_preferred_hours'], dtype=bool),
+            in_avoid_hours=np.asarray(data['in_avoid_hours'], dtype=bool),
+            charging_decision=np.asarray(data['charging_decision'], dtype=np.int32),
+            # Cache the hour once instead of recomputing it per analysis
+            hour=hour_of_day(timestamps),
+            seconds=record_seconds(timestamps),
+            decision_labels=np.asarray(data['charging_decision_labels'], dtype=object),
+        )
     except Exception as e:
         print(f"Error loading data: {e}")
         return None
 
-def analyze_charging_patterns(df):
+def read_history(csv_file, columns=None):
+    """Read the raw history columns with the fastest available reader"""
+    columns = columns or ANALYSIS_COLUMNS
+    try:
+        import pyarrow
+    except ImportError:
+        # pyarrow not installed - fall back to the pandas parser
+        import pandas as pd
+        df = pd.read_csv(csv_file, usecols=columns, parse_dates=['timestamp'])
+        data = {name: df[name].to_numpy() for name in columns}
+        labels, codes = np.unique(data['charging_decision'].astype(str), return_inverse=True)
+        data['charging_decision'] = codes
+        data['charging_decision_labels'] = labels
+        return data
+    
+    # The dataset shared with cost_analysis.py - only lines appended since the last run are parsed
+    try:
+        dataset_dir = dataset_dir_for(csv_file)
+        sync_dataset(csv_file, dataset_dir)
+        table = read_dataset(dataset_dir, columns)
+    except Exception as e:
+        print(f"Parquet dataset unavailable, reading CSV: {e}")
+        table = None
+    if table is None:
+        table = parse_history_csv(csv_file, columns)
+    return table_columns(table)
+
+def table_columns(table):
+    """Split a pyarrow Table into a dict of numpy arrays"""
+    import pyarrow as pa
+    data = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if pa.types.is_dictionary(column.type):
+            # Keep Arrow's integer codes rather than materialising every string
+            column = column.unify_dictionaries().combine_chunks()
+            data[name] = column.indices.to_numpy(zero_copy_only=False)
+            data[name + '_labels'] = column.dictionary.to_numpy(zero_copy_only=False)
+        else:
+            data[name] = column.to_numpy()
+    return data
+
+STATUS_COLUMNS = ['charger_connected', 'solar_detected', 'in_preferred_hours', 'in_avoid_hours']
+
+def summarize_status(log):
+    """Time (seconds) each status flag was set and voltage stats, in one sweep over the columns"""
+    # One 2-D bool block -> a single matrix-vector product for all four flags,
+    # weighted by the time each row covers rather than counted
+    flags = np.column_stack([getattr(log, name) for name in STATUS_COLUMNS])
+    flag_seconds = log.seconds @ flags
+    
+    voltages = log.voltage
+    vmin, vmax = voltages.min(), voltages.max()
+    return flag_seconds, np.average(voltages, weights=log.seconds), vmin, vmax
+
+def analyze_charging_patterns(log):
     """Analyze charging patterns and efficiency"""
     print("\n? CHARGING PATTERN ANALYSIS")
     print("=" * 50)
     
     # Calculate charging time percentages
-    total_records = len(df)
-    connected_time = len(df[df['charger_connected'] == True])
-    solar_time = len(df[df['solar_detected'] == True])
-    preferred_time = len(df[df['in_preferred_hours'] == True])
-    avoid_time = len(df[df['in_avoid_hours'] == True])
-    
-    print(f"Total monitoring time: {total_records} records")
-    print(f"Charger connected: {connected_time/total_records*100:.1f}% of time")
-    print(f"Solar detected: {solar_time/total_records*100:.1f}% of time")
-    print(f"In preferred hours: {preferred_time/total_records*100:.1f}% of time")
-    print(f"In avoid hours: {avoid_time/total_records*100:.1f}% of time")
+    total_time = log.seconds.sum()
+    flag_seconds, avg_voltage, min_voltage, max_voltage = summarize_status(log)
+    connected_time, solar_time, preferred_time, avoid_time = flag_seconds
+    
+    print(f"Total monitoring time: {total_time/3600:.1f} hours ({len(log)} records)")
+    print(f"Charger connected: {connected_time/total_time*100:.1f}% of time")
+    print(f"Solar detected: {solar_time/total_time*100:.1f}% of time")
+    print(f"In preferred hours: {preferred_time/total_time*100:.1f}% of time")
+    print(f"In avoid hours: {avoid_time/total_time*100:.1f}% of time")
     
     # Voltage statistics
     print(f"\n? VOLTAGE STATISTICS")
-    print(f"Average voltage: {df['voltage'].mean():.2f}V")
-    print(f"Min voltage: {df['voltage'].min():.2f}V")
-    print(f"Max voltage: {df['voltage'].max():.2f}V")
-    print(f"Voltage range: {df['voltage'].max() - df['voltage'].min():.2f}V")
+    print(f"Average voltage: {avg_voltage:.2f}V")
+    print(f"Min voltage: {min_voltage:.2f}V")
+    print(f"Max voltage: {max_voltage:.2f}V")
+    print(f"Voltage range: {max_voltage - min_voltage:.2f}V")
+
+def check_schedule_columns(log):
+    """Recompute the preferred/avoid hour flags from config and compare with the log"""
+    print("\n? SCHEDULE CONSISTENCY CHECK")
+    print("=" * 50)
+    
+    # Same rules as the monitor: weekends/holidays only prefer EV credit hours and never avoid
+    weekend = is_weekend(log.timestamp) | is_holiday(log.timestamp)
+    preferred = np.where(weekend, log.hour < 6, in_hour_mask(log.hour, PREFERRED_HOURS_MASK))
+    avoid = ~weekend & in_hour_mask(log.hour, AVOID_HOURS_MASK)
+    
+    for name, expected, logged in (('in_preferred_hours', preferred, log.in_preferred_hours),
+                                   ('in_avoid_hours', avoid, log.in_avoid_hours)):
+        mismatches = np.count_nonzero(expected != logged)
+        if mismatches:
+            print(f"{name}: {mismatches} records differ from the current schedule")
+        else:
+            print(f"{name}: matches the current schedule")
+
+def recent_rows(log, latest, window):
+    """Slice the rows newer than latest - window (log must be sorted by timestamp)"""
+    cutoff = latest - np.timedelta64(window)
+    return log.take(slice(np.searchsorted(log.timestamp, cutoff, side='left'), None))
 
-def plot_voltage_trends(df, days=7):
+def decimate_minmax(t, y, n_buckets=2000):
+    """Downsample a series to the min and max of each bucket, kept in time order"""
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return t, y
+    
+    edges = np.linspace(0, n, n_buckets + 1, dtype=np.int64)
+    out_t = np.empty(2 * n_buckets, dtype=t.dtype)
+    out_y = np.empty(2 * n_buckets, dtype=y.dtype)
+    for i in range(n_buckets):
+        start, end = edges[i], edges[i + 1]
+        segment = y[start:end]
+        lo, hi = sorted((segment.argmin(), segment.argmax()))
+        out_t[2 * i], out_y[2 * i] = t[start + lo], segment[lo]
+        out_t[2 * i + 1], out_y[2 * i + 1] = t[start + hi], segment[hi]
+    return out_t, out_y
+
+def plot_voltage_trends(log, latest, days=7):
     """Plot voltage trends over time"""
+    # matplotlib is slow to import on the Pi - only pay for it when plotting
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    
     # Filter to recent days
-    recent_date = df['timestamp'].max() - timedelta(days=days)
-    recent_df = df[df['timestamp'] >= recent_date]
+    recent = recent_rows(log, latest, timedelta(days=days))
+    
+    # A week of samples is far more points than pixels - keep only bucket extremes
+    timestamps = recent.timestamp
+    voltage_t, voltage = decimate_minmax(timestamps, recent.voltage)
+    charger_t, charger_status = decimate_minmax(
+        timestamps, recent.charger_connected.astype(np.int8))
+    solar_t, solar_status = decimate_minmax(
+        timestamps, recent.solar_detected.astype(np.int8))
     
     fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(15, 12))
     
     # Plot 1: Voltage over time
-    ax1.plot(recent_df['timestamp'], recent_df['voltage'], 'b-', linewidth=1, alpha=0.7)
+    ax1.plot(voltage_t, voltage, 'b-', linewidth=1, alpha=0.7)
     ax1.axhline(y=24.8, color='r', linestyle='--', label='High Threshold (24.8V)')
     ax1.axhline(y=24.5, color='orange', linestyle='--', label='Low Threshold (24.5V)')
     ax1.axhline(y=22.0, color='red', linestyle=':', label='Emergency (22.0V)')
@@ -65,8 +231,7 @@ def plot_voltage_trends(df, days=7):
     ax1.grid(True, alpha=0.3)
     
     # Plot 2: Charger status
-    charger_status = recent_df['charger_connected'].astype(int)
-    ax2.fill_between(recent_df['timestamp'], 0, charger_status, 
+    ax2.fill_between(charger_t, 0, charger_status, 
                      alpha=0.3, color='green', label='Charger Connected')
     ax2.set_ylabel('Charger Status')
     ax2.set_ylim(-0.1, 1.1)
@@ -74,8 +239,7 @@ def plot_voltage_trends(df, days=7):
     ax2.grid(True, alpha=0.3)
     
     # Plot 3: Solar detection
-    solar_status = recent_df['solar_detected'].astype(int)
-    ax3.fill_between(recent_df['timestamp'], 0, solar_status, 
+    ax3.fill_between(solar_t, 0, solar_status, 
                      alpha=0.3, color='orange', label='Solar Detected')
     ax3.set_ylabel('Solar Status')
     ax3.set_xlabel('Time')
@@ -93,47 +257,53 @@ def plot_voltage_trends(df, days=7):
     plt.savefig('/home/erictran/Script/voltage_analysis.png', dpi=300, bbox_inches='tight')
     print(f"? Voltage trend plot saved to: voltage_analysis.png")
 
-def analyze_solar_efficiency(df):
+def analyze_solar_efficiency(log):
     """Analyze solar charging efficiency"""
     print("\n? SOLAR ANALYSIS")
     print("=" * 50)
     
-    solar_df = df[df['solar_detected'] == True]
-    if len(solar_df) == 0:
+    voltages = log.voltage
+    solar_mask = log.solar_detected
+    if not solar_mask.any():
         print("No solar activity detected in logs")
         return
     
-    # Solar hours analysis
-    solar_df['hour'] = solar_df['timestamp'].dt.hour
-    solar_by_hour = solar_df.groupby('hour').size()
+    # Solar hours analysis - hour of day is known to be 0-23, so bincount it
+    solar_by_hour = np.bincount(log.hour[solar_mask], weights=log.seconds[solar_mask] / 3600, minlength=24)
     
     print("Solar activity by hour:")
-    for hour, count in solar_by_hour.items():
-        print(f"  {hour:02d}:00 - {count} records")
+    for hour, hours in enumerate(solar_by_hour):
+        if hours:
+            print(f"  {hour:02d}:00 - {hours:.1f} hours")
     
     # Voltage during solar vs non-solar
-    solar_avg_voltage = solar_df['voltage'].mean()
-    non_solar_avg_voltage = df[df['solar_detected'] == False]['voltage'].mean()
+    solar_avg_voltage = voltages[solar_mask].mean()
+    non_solar_avg_voltage = voltages[~solar_mask].mean()
     
     print(f"\nAverage voltage during solar: {solar_avg_voltage:.2f}V")
     print(f"Average voltage without solar: {non_solar_avg_voltage:.2f}V")
     print(f"Solar voltage boost: {solar_avg_voltage - non_solar_avg_voltage:.2f}V")
 
-def show_recent_decisions(df, hours=24):
+def show_recent_decisions(log, latest, hours=24):
     """Show recent charging decisions"""
     print(f"\n? RECENT CHARGING DECISIONS (Last {hours} hours)")
     print("=" * 70)
     
-    recent_time = df['timestamp'].max() - timedelta(hours=hours)
-    recent_df = df[df['timestamp'] >= recent_time]
+    recent = recent_rows(log, latest, timedelta(hours=hours))
     
-    # Group by charging decision
-    decisions = recent_df['charging_decision'].value_counts()
+    # Decisions are small integer codes, so counting is a single bincount
+    # (and the time each decision held a weighted one)
+    n_labels = len(log.decision_labels)
+    counts = np.bincount(recent.charging_decision, minlength=n_labels)
+    decision_seconds = np.bincount(recent.charging_decision, weights=recent.seconds, minlength=n_labels)
+    total_seconds = recent.seconds.sum()
     
     print("Decision breakdown:")
-    for decision, count in decisions.items():
-        percentage = count / len(recent_df) * 100
-        print(f"  {decision}: {count} times ({percentage:.1f}%)")
+    for decision, count, seconds in zip(log.decision_labels, counts, decision_seconds):
+        if not count:
+            continue
+        percentage = seconds / total_seconds * 100
+        print(f"  {decision}: {count} times ({percentage:.1f}% of time)")
 
 def main():
     csv_file = "/home/erictran/Script/voltage_history.csv"
@@ -144,24 +314,37 @@ def main():
         return
     
     print("? Loading voltage data...")
-    df = load_voltage_data(csv_file)
+    log = load_voltage_data(csv_file)
     
-    if df is None:
+    if log is None:
         return
     
-    print(f"? Loaded {len(df)} records from {df['timestamp'].min()} to {df['timestamp'].max()}")
+    # A freshly rotated (or just created) log has a header and no rows yet
+    if len(log.timestamp) == 0:
+        print(f"? No data found in {csv_file} yet - wait for the monitor to log some readings.")
+        return
+    
+    # The log is appended in time order; only re-sort if the clock jumped backwards
+    timestamps = log.timestamp
+    if (timestamps[1:] < timestamps[:-1]).any():
+        log = log.take(np.argsort(timestamps, kind='stable'))
+        log = replace(log, seconds=record_seconds(log.timestamp))  # Gaps of the sorted rows
+    latest = log.timestamp[-1]
+    
+    print(f"? Loaded {len(log)} records from {log.timestamp[0]} to {latest}")
     
     # Run analyses
-    analyze_charging_patterns(df)
-    analyze_solar_efficiency(df)
-    show_recent_decisions(df)
+    analyze_charging_patterns(log)
+    check_schedule_columns(log)
+    analyze_solar_efficiency(log)
+    show_recent_decisions(log, latest)
     
     # Generate plots if matplotlib is available
     try:
-        plot_voltage_trends(df)
+        plot_voltage_trends(log, latest)
     except ImportError:
-        print("\n? Install matplotlib and pandas for voltage trend plots:")
-        print("pip3 install matplotlib pandas")
+        print("\n? Install matplotlib for voltage trend plots:")
+        print("pip3 install matplotlib")
     except Exception as e:
         print(f"Plot generation error: {e}")
 
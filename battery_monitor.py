@@ -13,11 +13,16 @@ import serial
 import time
 import logging
 import os
+import glob
+import select
 from datetime import datetime
 from config import RELAY_PIN, SERIAL_PORTS, BAUD_RATE
 VOLTAGE_THRESHOLD_HIGH = 24.8  # Volts - disconnect charger above this
 VOLTAGE_THRESHOLD_LOW = 24.5   # Volts - reconnect charger below this (hysteresis)
 MONITOR_INTERVAL = 5           # Seconds between voltage checks
+READ_TIMEOUT = 2               # Seconds to wait for a voltage line per check
+MAX_PARTIAL_LINE = 4096        # Drop a partial line longer than this (garbage on the wire)
+LAST_PORT_FILE = os.path.expanduser('~/.battery_monitor_last_port')  # Last working serial port
 
 # Setup logging
 logging.basicConfig(
@@ -36,6 +41,7 @@ class BatteryMonitor:
         self.setup_serial()
         self.charger_connected = True  # Start with charger connected
         self.last_voltage = 0.0
+        self.buf = bytearray()  # Unparsed serial bytes (partial VE.Direct line)
         
     def setup_gpio(self):
         """Initialize GPIO for relay control"""
@@ -47,26 +53,33 @@ class BatteryMonitor:
         
     def find_usb_device(self):
         """Find the first available USB serial device"""
-        for port in SERIAL_PORTS:
-            if os.path.exists(port):
-                try:
-                    # Try to open the device briefly to verify it's accessible
-                    test_ser = serial.Serial(port, baudrate=BAUD_RATE, timeout=1)
-                    test_ser.close()
-                    logging.info(f"Found available USB device: {port}")
-                    return port
-                except Exception as e:
-                    logging.debug(f"USB device {port} not accessible: {e}")
-                    continue
-            else:
-                logging.debug(f"USB device {port} does not exist")
+        # Only probe devices that actually exist, configured ports first
+        present = set(glob.glob('/dev/ttyUSB*'))
+        available_ports = [port for port in SERIAL_PORTS if port in present]
+        available_ports += sorted(present.difference(SERIAL_PORTS))
+        
+        # Try the last port that worked first - usually the only probe needed
+        last_port = self.load_last_port()
+        if last_port in available_ports:
+            available_ports.remove(last_port)
+            available_ports.insert(0, last_port)
+        
+        for port in available_ports:
+            try:
+                # Try to open the device briefly to verify it's accessible
+                test_ser = serial.Serial(port, baudrate=BAUD_RATE, timeout=1)
+                test_ser.close()
+                logging.info(f"Found available USB device: {port}")
+                return port
+            except Exception as e:
+                logging.debug(f"USB device {port} not accessible: {e}")
+                continue
         
         # If no devices found, raise an error
-        available_ports = [port for port in SERIAL_PORTS if os.path.exists(port)]
         if available_ports:
             error_msg = f"No accessible USB devices found. Available but inaccessible: {available_ports}"
         else:
-            error_msg = f"No USB devices found. Checked: {SERIAL_PORTS}"
+            error_msg = f"No USB devices found. Checked: {SERIAL_PORTS} and /dev/ttyUSB*"
         
         logging.error(error_msg)
         raise Exception(error_msg)
@@ -76,24 +89,78 @@ class BatteryMonitor:
         try:
             self.ser = serial.Serial(self.serial_port, baudrate=BAUD_RATE, timeout=2)
             logging.info(f"Serial connection established on {self.serial_port}")
+            self.save_last_port(self.serial_port)
         except Exception as e:
             logging.error(f"Failed to setup serial connection on {self.serial_port}: {e}")
             raise
+    
+    def load_last_port(self):
+        """Return the last serial port that worked, or None"""
+        try:
+            with open(LAST_PORT_FILE) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+    
+    def save_last_port(self, port):
+        """Remember a working serial port for the next startup"""
+        if port == self.load_last_port():
+            return
+        try:
+            with open(LAST_PORT_FILE, 'w') as f:
+                f.write(port + '\n')
+        except OSError as e:
+            logging.debug(f"Could not save last serial port: {e}")
             
     def read_voltage(self):
         """Read voltage from VE.Direct protocol"""
         try:
-            # Clear any pending data
-            self.ser.flushInput()
+            deadline = time.monotonic() + READ_TIMEOUT
+            voltage = None
+            
+            fd = self.ser.fileno()
             
-            # Read voltage data
-            for _ in range(10):  # Try up to 10 times to get voltage reading
-                line = self.ser.readline().decode('utf-8', errors='ignore').strip()
-                if line.startswith("V"):
-                    mv = int(line.split("\t")[1])  # VE.Direct gives mV
-                    voltage = mv / 1000.0
+            # Don't flush the input: buffered frames already hold valid readings
+            while True:
+                # One kernel wait for data (or the deadline), then one read of whatever arrived
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([fd], [], [], remaining)
+                if not readable:
+                    break
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    raise serial.SerialException("device reports readiness to read but returned no data")
+                self.buf.extend(chunk)
+                
+                # Parse every complete line, keeping the most recent voltage
+                start = 0
+                try:
+                    while True:
+                        end = self.buf.find(b'\n', start)
+                        if end < 0:
+                            break
+                        # VE.Direct is ASCII: match and parse the raw bytes, no decode
+                        if self.buf.startswith(b'V\t', start, end):
+                            try:
+                                mv = int(self.buf[start + 2:end])  # VE.Direct gives mV; int() skips \r
+                                voltage = mv / 1000.0
+                            except ValueError:
+                                pass  # Noise or a truncated frame - skip the line
+                        start = end + 1
+                finally:
+                    # Keep only the trailing partial line for the next call - parsed
+                    # lines must never stay at the front of the buffer
+                    del self.buf[:start]
+                    if len(self.buf) > MAX_PARTIAL_LINE:
+                        self.buf.clear()
+                
+                if voltage is not None:
                     self.last_voltage = voltage
                     return voltage
+                if time.monotonic() >= deadline:
+                    break
                     
             logging.warning("No voltage reading received")
             return None
@@ -123,6 +190,8 @@ class BatteryMonitor:
         logging.info(f"Low voltage threshold: {VOLTAGE_THRESHOLD_LOW}V")
         
         try:
+            # Fixed-rate schedule: time spent reading doesn't push later checks back
+            next_check = time.monotonic()
             while True:
                 voltage = self.read_voltage()
                 
@@ -138,7 +207,12 @@ class BatteryMonitor:
                 else:
                     logging.warning("Failed to read voltage - maintaining current state")
                     
-                time.sleep(MONITOR_INTERVAL)
+                next_check += MONITOR_INTERVAL
+                delay = next_check - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_check = time.monotonic()  # Fell behind - don't burst to catch up
                 
         except KeyboardInterrupt:
             logging.info("Monitoring stopped by user")
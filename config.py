@@ -30,6 +30,9 @@ VOLTAGE_HEALTHY_THRESHOLD = 23.0    # Voltage above which battery is considered
 
 # Monitoring Settings
 MONITOR_INTERVAL = 60          # Seconds between voltage checks (increased for time-based)
+MONITOR_INTERVAL_MAX = 240     # Longest interval the checks back off to while voltage holds steady
+STABLE_VOLTAGE_DELTA = 0.02    # Reads closer than this (volts) to the previous one count as steady
+STABLE_READS_BEFORE_BACKOFF = 10  # Steady reads in a row before the interval starts doubling
 LOG_INTERVAL = 300             # Seconds between detailed log entries (5 minutes)
 
 # System Maintenance
@@ -71,6 +74,13 @@ AVOID_CHARGING_HOURS = [
     (17, 20),  # 5 PM - 8 PM (peak rates - most expensive)
 ]
 
+# Utility holidays - billed like weekends (off-peak all day, no avoid hours)
+# Format: "YYYY-MM-DD"
+HOLIDAYS = [
+    # "2025-12-25",  # Christmas Day
+    # "2026-01-01",  # New Year's Day
+]
+
 # Granular seasonal solar adjustments based on daylight hours and solar intensity
 # Each month gets specific solar generation expectations and daylight hours
 MONTHLY_SOLAR_PROFILE = {
@@ -184,17 +194,30 @@ INTERNET_RESET_ENABLED = True         # Enable automatic Pi reset on internet fa
 # Email Configuration (you'll need to set these up)
 SMTP_SERVER = "smtp.gmail.com"           # Gmail SMTP server
 SMTP_PORT = 587                          # Gmail SMTP port
+SMTP_MAX_MESSAGES_PER_SESSION = 100      # Log in again after this many emails on one connection
+SMTP_IDLE_SECONDS = 300                  # Don't reuse a connection idle longer than this
 EMAIL_FROM = "eric.n.tran@gmail.com"                          # Your email address (set this!)
 EMAIL_PASSWORD = "qkiu pjeu vogc wedr"                      # App password for Gmail (set this!)
 EMAIL_TO = ["eric.n.tran@gmail.com"]                            # List of email addresses to notify (set this!)
 
 # Email notification cooldown (prevent spam)
 EMAIL_COOLDOWN_MINUTES = 30              # Wait 30 minutes between similar alerts
+EMAIL_DEDUPE_MINUTES = 60                # Drop an email identical to one sent within this window
+ALERT_STATE_FILE = "/home/erictran/Script/alert_state.json"  # Alert cooldowns kept across restarts
 
 # Logging Configuration
 LOG_FILE = "/home/erictran/Script/battery_monitor.log"
 VOLTAGE_LOG_FILE = "/home/erictran/Script/voltage_history.csv"
 ENABLE_CSV_LOGGING = True
+# Buffering trades SD card writes for what a power cut can lose. Log INFO lines are
+# written every LOG_FLUSH_SECONDS (about 5 cycles, so ~1 write per 5 min instead of 1
+# per cycle); warnings and errors are written at once. A power cut loses at most the
+# last 5 minutes of INFO lines and of voltage history rows (5 rows at MONITOR_INTERVAL,
+# fewer while backed off) - plus whatever the OS had not yet written back to the card.
+LOG_BUFFER_RECORDS = 64                  # Log records buffered before a file write (warnings flush at once)
+LOG_FLUSH_SECONDS = 300                  # ...or at most this many seconds, whichever comes first
+CSV_FLUSH_ROWS = 5                       # Voltage history rows buffered before appending to the CSV
+CSV_FLUSH_SECONDS = 300                  # ...or at most this many seconds, whichever comes first
 
 # Seasonal Adjustments (optional - can be expanded later)
 SEASONAL_ADJUSTMENTS = {
@@ -203,3 +226,46 @@ SEASONAL_ADJUSTMENTS = {
     'spring': {'solar_hours': (10, 16)},
     'fall': {'solar_hours': (10, 16)},
 }
+
+# Flat month-indexed lookup tables built from MONTHLY_SOLAR_PROFILE
+# (index = month 1-12; index 0 mirrors January, the profile fallback)
+SOLAR_FACTOR_BY_MONTH = tuple(MONTHLY_SOLAR_PROFILE[m or 1]['solar_factor'] for m in range(13))
+DAYLIGHT_BY_MONTH = tuple(MONTHLY_SOLAR_PROFILE[m or 1]['daylight'] for m in range(13))
+SEASON_NAME_BY_MONTH = tuple(MONTHLY_SOLAR_PROFILE[m or 1]['name'] for m in range(13))
+
+def solar_lookup(month):
+    """Return (solar_factor, daylight_start, daylight_end) for a month 1-12"""
+    daylight_start, daylight_end = DAYLIGHT_BY_MONTH[month]
+    return SOLAR_FACTOR_BY_MONTH[month], daylight_start, daylight_end
+
+def hour_mask(ranges):
+    """24-bit int with bit h set for every hour h inside the (start_hour, end_hour) ranges"""
+    mask = 0
+    for start_hour, end_hour in ranges:
+        if start_hour <= end_hour:
+            hours = range(start_hour, end_hour)
+        else:  # Overnight range (crosses midnight)
+            hours = [*range(start_hour, 24), *range(end_hour)]
+        for hour in hours:
+            mask |= 1 << hour
+    return mask
+
+# Hour-of-day bitmasks: "is hour h in the window" becomes (MASK >> h) & 1
+DAYLIGHT_MASK_BY_MONTH = tuple(hour_mask([daylight]) for daylight in DAYLIGHT_BY_MONTH)
+PREFERRED_HOURS_MASK = hour_mask(PREFERRED_CHARGING_HOURS)
+AVOID_HOURS_MASK = hour_mask(AVOID_CHARGING_HOURS)
+
+def is_daylight_hour(month, hour):
+    """True if hour (0-23) falls inside the month's daylight window"""
+    return bool((DAYLIGHT_MASK_BY_MONTH[month] >> hour) & 1)
+
+def solar_hours_mask(month):
+    """Hours the time-based solar detector counts as solar for a month"""
+    mask = DAYLIGHT_MASK_BY_MONTH[month]
+    start_hour, end_hour = DAYLIGHT_BY_MONTH[month]
+    # In very low solar months (Dec/Jan), only the middle of the day counts
+    if SOLAR_FACTOR_BY_MONTH[month] < 0.3 and start_hour + 2 < end_hour - 2:
+        mask &= hour_mask([(start_hour + 2, end_hour - 2)])
+    return mask
+
+SOLAR_HOURS_MASK_BY_MONTH = tuple(solar_hours_mask(month) for month in range(13))
@@ -4,84 +4,143 @@ Cost Analysis Tool for Smart Battery Monitor
 Analyzes charging costs and savings from TOD optimization
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 from datetime import datetime, timedelta
 import sys
 import os
 from config import RATE_INFO
+from history_dataset import dataset_dir_for, latest_timestamp, read_dataset, record_seconds, sync_dataset
+
+
+# Assume average charging power (you can adjust this)
+AVERAGE_CHARGING_POWER_KW = 1.0  # 1kW average charging power
+
+# Savings are measured against always charging at the highest peak rate
+WORST_CASE_RATE = max(RATE_INFO['summer']['peak'], RATE_INFO['winter']['peak'])
+
+# Columns the cost analyses read (the CSV has several more)
+COST_COLUMNS = [
+    'timestamp', 'charger_connected', 'solar_detected', 'in_avoid_hours',
+    'charging_decision', 'rate_type', 'current_rate_cents'
+]
+
+# rate_type / charging_decision hold a handful of distinct strings each,
+# so categories let groupby and value_counts work on integer codes
+COST_DTYPES = {
+    'charger_connected': 'bool',
+    'solar_detected': 'bool',
+    'in_avoid_hours': 'bool',
+    'current_rate_cents': 'float32',
+    'rate_type': 'category',
+    'charging_decision': 'category',
+}
 
 def load_and_analyze_costs(csv_file, days=30):
     """Load data and calculate charging costs"""
     try:
-        df = pd.read_csv(csv_file)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Filter to recent period
-        recent_date = df['timestamp'].max() - timedelta(days=days)
-        df = df[df['timestamp'] >= recent_date]
+        # Prefer the date-partitioned Parquet dataset; parse the CSV without pyarrow
+        df = read_recent_from_dataset(csv_file, days)
+        if df is None:
+            df = read_recent_from_csv(csv_file, days)
         
         if len(df) == 0:
             print("No data found for analysis period")
             return None
-            
+        
         return df
         
     except Exception as e:
         print(f"Error loading data: {e}")
         return None
 
-def calculate_charging_costs(df):
+def read_recent_from_csv(csv_file, days):
+    """Parse the whole CSV and keep the last `days` days (without pyarrow there is no dataset)"""
+    import pandas as pd
+    
+    # Only parse the columns used below, with their types decided up front
+    # so timestamps, flags and categories are converted in the C parser
+    df = pd.read_csv(csv_file, usecols=COST_COLUMNS, engine='c',
+                     parse_dates=['timestamp'], dtype=COST_DTYPES)
+    if len(df) == 0:
+        return df
+    
+    # Filter to recent period - the log is appended in time order, so the
+    # cutoff is a binary search and the result a slice rather than a masked copy
+    if not df['timestamp'].is_monotonic_increasing:
+        df = df.sort_values('timestamp', ignore_index=True)
+    recent_date = df['timestamp'].iloc[-1] - timedelta(days=days)
+    start = df['timestamp'].searchsorted(recent_date, side='left')
+    return df.iloc[start:]
+
+def read_recent_from_dataset(csv_file, days):
+    """Bring the Parquet dataset up to date and read only the last `days` days of it"""
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    
+    dataset_dir = dataset_dir_for(csv_file)
+    try:
+        sync_dataset(csv_file, dataset_dir)
+        latest = latest_timestamp(dataset_dir)
+        if latest is None:
+            return None
+        
+        table = read_dataset(dataset_dir, COST_COLUMNS, since=latest - timedelta(days=days))
+        return table.to_pandas()
+    except Exception as e:
+        print(f"Parquet dataset unavailable, reading CSV: {e}")
+        return None
+
+def group_count_sum(categorical, values=None):
+    """Per-category record counts (and sums of values) in one pass over the integer codes"""
+    codes = categorical.cat.codes.to_numpy()
+    n_groups = len(categorical.cat.categories)
+    counts = np.bincount(codes, minlength=n_groups)
+    sums = None if values is None else np.bincount(codes, weights=values, minlength=n_groups)
+    return counts, sums
+
+def calculate_charging_costs(charging_df, charging_hours, total_hours):
     """Calculate actual vs theoretical charging costs"""
     print("\n? CHARGING COST ANALYSIS")
     print("=" * 60)
     
-    # Filter to only when charger was connected
-    charging_df = df[df['charger_connected'] == True].copy()
-    
     if len(charging_df) == 0:
         print("No charging periods found in data")
         return
     
-    # Assume average charging power (you can adjust this)
-    AVERAGE_CHARGING_POWER_KW = 1.0  # 1kW average charging power
-    HOURS_PER_RECORD = 30 / 3600     # 30 seconds per record converted to hours
-    
-    # Calculate energy consumed and costs
-    charging_df['energy_kwh'] = AVERAGE_CHARGING_POWER_KW * HOURS_PER_RECORD
-    charging_df['cost_cents'] = charging_df['energy_kwh'] * charging_df['current_rate_cents']
-    
-    # Total costs
-    total_energy = charging_df['energy_kwh'].sum()
-    total_cost = charging_df['cost_cents'].sum()
+    # Each record stands for the time until the next reading (see record_seconds)
+    energy_per_record = charging_hours * AVERAGE_CHARGING_POWER_KW  # kWh
+    rates = charging_df['current_rate_cents'].to_numpy()
+    total_energy = float(energy_per_record.sum())
+    total_cost = float(energy_per_record @ rates)
     avg_rate = total_cost / total_energy if total_energy > 0 else 0
     
-    print(f"? CHARGING SUMMARY (Last {len(df)/120:.1f} hours)")
+    print(f"? CHARGING SUMMARY (Last {total_hours:.1f} hours)")
     print(f"Total energy charged: {total_energy:.2f} kWh")
     print(f"Total cost: ${total_cost/100:.2f}")
     print(f"Average rate paid: {avg_rate:.2f}c/kWh")
     
     # Break down by rate type
     print(f"\n? CHARGING BY RATE PERIOD:")
-    rate_breakdown = charging_df.groupby('rate_type').agg({
-        'energy_kwh': 'sum',
-        'cost_cents': 'sum',
-        'current_rate_cents': 'mean'
-    }).round(2)
-    
-    for rate_type, row in rate_breakdown.iterrows():
-        energy = row['energy_kwh']
-        cost = row['cost_cents']
-        rate = row['current_rate_cents']
-        percentage = (energy / total_energy * 100) if total_energy > 0 else 0
-        
-        print(f"  {rate_type}: {energy:.2f} kWh ({percentage:.1f}%) at {rate:.1f}c/kWh = ${cost/100:.2f}")
+    rate_types = charging_df['rate_type'].cat.categories
+    counts, energy_sums = group_count_sum(charging_df['rate_type'], energy_per_record)
+    _, cost_sums = group_count_sum(charging_df['rate_type'], energy_per_record * rates)
     
-    # Calculate savings vs always charging at peak rate
-    summer_peak_rate = RATE_INFO['summer']['peak']
-    winter_peak_rate = RATE_INFO['winter']['peak']
-    worst_case_rate = max(summer_peak_rate, winter_peak_rate)
+    # Whole-column arithmetic, then one formatting pass over the rate periods seen
+    seen = (counts > 0) & (energy_sums > 0)
+    energy = energy_sums[seen]
+    cost = cost_sums[seen]
+    rate = cost / energy
+    percentage = energy / total_energy * 100  # total_energy > 0: there is charging data
+    
+    print("\n".join(
+        f"  {t}: {e:.2f} kWh ({p:.1f}%) at {r:.1f}c/kWh = ${c/100:.2f}"
+        for t, e, p, r, c in zip(rate_types[seen], energy, percentage, rate, cost)
+    ))
     
+    # Calculate savings vs always charging at peak rate
+    worst_case_rate = WORST_CASE_RATE
     worst_case_cost = total_energy * worst_case_rate
     savings = worst_case_cost - total_cost
     savings_percentage = (savings / worst_case_cost * 100) if worst_case_cost > 0 else 0
@@ -90,30 +149,36 @@ def calculate_charging_costs(df):
     print(f"Cost if always charged at peak rate ({worst_case_rate:.1f}c/kWh): ${worst_case_cost/100:.2f}")
     print(f"Actual smart charging cost: ${total_cost/100:.2f}")
     print(f"Total savings: ${savings/100:.2f} ({savings_percentage:.1f}%)")
-    
-    return charging_df
 
-def analyze_solar_impact(df):
+def analyze_solar_impact(df, charging_mask, hours):
     """Analyze the impact of solar charging"""
     print(f"\n? SOLAR CHARGING ANALYSIS")
     print("=" * 60)
     
-    solar_charging = df[(df['charger_connected'] == True) & (df['solar_detected'] == True)]
-    total_charging = df[df['charger_connected'] == True]
+    # Pack (charging, solar) into one key 0-3 so time and rate sums for
+    # every combination come out of a single pass
+    # (bool arrays are viewed as uint8 in place - no conversion copies)
+    solar_mask = df['solar_detected'].to_numpy(dtype=bool)
+    key = charging_mask.view(np.uint8) * 2 + solar_mask.view(np.uint8)
+    time_sums = np.bincount(key, weights=hours, minlength=4)
+    rate_sums = np.bincount(key, weights=hours * df['current_rate_cents'].to_numpy(), minlength=4)
+    non_solar_hours, solar_hours = float(time_sums[2]), float(time_sums[3])
+    total_hours = non_solar_hours + solar_hours
     
-    if len(total_charging) == 0:
+    if total_hours == 0:
         print("No charging data available")
         return
     
-    solar_percentage = len(solar_charging) / len(total_charging) * 100
+    solar_percentage = solar_hours / total_hours * 100
     
-    print(f"Solar charging periods: {len(solar_charging)} records")
-    print(f"Total charging periods: {len(total_charging)} records")
+    print(f"Solar charging periods: {solar_hours:.1f} hours")
+    print(f"Total charging periods: {total_hours:.1f} hours")
     print(f"Solar charging percentage: {solar_percentage:.1f}%")
     
-    if len(solar_charging) > 0:
-        avg_solar_rate = solar_charging['current_rate_cents'].mean()
-        avg_non_solar_rate = df[(df['charger_connected'] == True) & (df['solar_detected'] == False)]['current_rate_cents'].mean()
+    if solar_hours > 0:
+        # Time-weighted averages - backed-off readings cover more time each
+        avg_solar_rate = rate_sums[3] / solar_hours
+        avg_non_solar_rate = rate_sums[2] / non_solar_hours if non_solar_hours else float('nan')
         
         print(f"Average rate during solar charging: {avg_solar_rate:.1f}c/kWh")
         print(f"Average rate during non-solar charging: {avg_non_solar_rate:.1f}c/kWh")
@@ -121,42 +186,59 @@ def analyze_solar_impact(df):
         if avg_non_solar_rate > avg_solar_rate:
             print(f"Solar charging saves: {avg_non_solar_rate - avg_solar_rate:.1f}c/kWh")
 
-def plot_cost_trends(df):
+def plot_cost_trends(df, charging_mask, hours):
     """Plot charging costs over time"""
+    # Imported here so the text reports don't pay for matplotlib;
+    # Agg renders straight to PNG without a display (headless Pi)
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    import pandas as pd
+    
     try:
-        charging_df = df[df['charger_connected'] == True].copy()
-        
-        if len(charging_df) == 0:
+        if not charging_mask.any():
             print("No charging data to plot")
             return
             
-        # Resample to hourly data
-        charging_df.set_index('timestamp', inplace=True)
-        hourly_data = charging_df.resample('H').agg({
+        # Aggregate per hour in one groupby over the whole period (no set_index/resample)
+        hour = df['timestamp'].to_numpy().astype('datetime64[h]')
+        solar_charging = charging_mask & df['solar_detected'].to_numpy(dtype=bool)
+        hourly_data = pd.DataFrame({
+            'current_rate_cents': df['current_rate_cents'].to_numpy(),
+            'charging_hours': hours * charging_mask,
+            'solar_detected': solar_charging,
+        }).groupby(hour).agg({
             'current_rate_cents': 'mean',
-            'charger_connected': 'sum',
+            'charging_hours': 'sum',
             'solar_detected': 'any'
-        }).fillna(0)
+        })
+        
+        # Convert once to plain ndarrays (dates as matplotlib day numbers) so
+        # plotting never converts timestamps one element at a time
+        x = mdates.date2num(hourly_data.index.to_numpy())
+        rate = hourly_data['current_rate_cents'].to_numpy()
+        charging = hourly_data['charging_hours'].to_numpy()
+        solar = hourly_data['solar_detected'].to_numpy(dtype=bool)
         
         fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(15, 10))
         
         # Plot 1: Electricity rates over time
-        ax1.plot(hourly_data.index, hourly_data['current_rate_cents'], 'b-', linewidth=1)
-        ax1.fill_between(hourly_data.index, 0, hourly_data['current_rate_cents'], 
-                        where=hourly_data['charger_connected'] > 0, alpha=0.3, color='green', 
+        ax1.plot(x, rate, 'b-', linewidth=1)
+        ax1.fill_between(x, 0, rate, where=charging > 0, alpha=0.3, color='green',
                         label='Charging Periods')
+        ax1.xaxis_date()
         ax1.set_ylabel('Rate (c/kWh)')
         ax1.set_title('Electricity Rates and Charging Periods')
         ax1.legend()
         ax1.grid(True, alpha=0.3)
         
         # Plot 2: Charging activity
-        ax2.bar(hourly_data.index, hourly_data['charger_connected'], width=0.04, 
-               alpha=0.7, color='green', label='Charging Time')
-        solar_periods = hourly_data[hourly_data['solar_detected']]
-        ax2.bar(solar_periods.index, solar_periods['charger_connected'], width=0.04,
+        ax2.bar(x, charging, width=1/24, alpha=0.7, color='green', label='Charging Time')
+        ax2.bar(x[solar], charging[solar], width=1/24,
                alpha=0.9, color='orange', label='Solar + Charging')
-        ax2.set_ylabel('Charging Activity')
+        ax2.xaxis_date()
+        ax2.set_ylabel('Charging Hours')
         ax2.set_xlabel('Time')
         ax2.set_title('Charging Activity (with Solar Detection)')
         ax2.legend()
@@ -169,28 +251,33 @@ def plot_cost_trends(df):
     except Exception as e:
         print(f"Error creating plots: {e}")
 
-def show_optimization_summary(df):
+def show_optimization_summary(df, charging_mask, hours):
     """Show how well the system is optimizing for TOD rates"""
     print(f"\n? OPTIMIZATION EFFECTIVENESS")
     print("=" * 60)
     
-    # Count charging decisions
-    decisions = df['charging_decision'].value_counts()
-    total_decisions = len(df)
+    # Count charging decisions (most frequent first) and the share of time each held
+    decisions = df['charging_decision'].cat.categories
+    counts, decision_hours = group_count_sum(df['charging_decision'], hours)
+    total_hours = hours.sum()
     
     print("Charging decision breakdown:")
-    for decision, count in decisions.items():
-        percentage = count / total_decisions * 100
-        print(f"  {decision}: {count} times ({percentage:.1f}%)")
+    for i in np.argsort(-counts, kind='stable'):
+        decision, count = decisions[i], counts[i]
+        if count == 0:
+            continue  # Category seen outside the analysis period
+        percentage = decision_hours[i] / total_hours * 100
+        print(f"  {decision}: {count} times ({percentage:.1f}% of time)")
     
     # Peak avoidance effectiveness
-    peak_periods = df[df['in_avoid_hours'] == True]
-    peak_charging = peak_periods[peak_periods['charger_connected'] == True]
+    peak_mask = df['in_avoid_hours'].to_numpy(dtype=bool)
+    peak_hours = float(hours[peak_mask].sum())
+    peak_charging_hours = float(hours[peak_mask & charging_mask].sum())
     
-    if len(peak_periods) > 0:
-        peak_avoidance = (1 - len(peak_charging) / len(peak_periods)) * 100
+    if peak_hours > 0:
+        peak_avoidance = (1 - peak_charging_hours / peak_hours) * 100
         print(f"\nPeak hour avoidance: {peak_avoidance:.1f}%")
-        print(f"Peak periods: {len(peak_periods)} total, {len(peak_charging)} with charging")
+        print(f"Peak periods: {peak_hours:.1f} hours total, {peak_charging_hours:.1f} with charging")
 
 def main():
     csv_file = "/home/erictran/Script/voltage_history.csv"
@@ -200,22 +287,34 @@ def main():
         print("Run the smart battery monitor first to generate data.")
         return
     
-    print("? Loading charging cost data...")
+    print("? Loading charging cost data...", flush=True)
     df = load_and_analyze_costs(csv_file)
     
     if df is None:
         return
     
+    # The reports print many short lines; block-buffer stdout so they go out
+    # in a few large writes instead of one write per line on a slow console
+    sys.stdout.reconfigure(line_buffering=False)
+    
     print(f"? Loaded {len(df)} records for cost analysis")
     
+    # Filter to charging periods once and share the result between analyses
+    charging_mask = df['charger_connected'].to_numpy(dtype=bool)
+    charging_df = df.loc[charging_mask]  # Read-only from here - analyses never assign columns
+    # Rows are not evenly spaced (the monitor backs off while voltage is steady),
+    # so time, energy and cost are weighted by the hours each row covers
+    hours = record_seconds(df['timestamp'].to_numpy()) / 3600
+    
     # Run analyses
-    charging_df = calculate_charging_costs(df)
-    analyze_solar_impact(df)
-    show_optimization_summary(df)
+    calculate_charging_costs(charging_df, hours[charging_mask], float(hours.sum()))
+    analyze_solar_impact(df, charging_mask, hours)
+    show_optimization_summary(df, charging_mask, hours)
+    sys.stdout.flush()  # Show the reports before the (slow) plot
     
     # Generate plots if possible
     try:
-        plot_cost_trends(df)
+        plot_cost_trends(df, charging_mask, hours)
     except ImportError:
         print("\n? Install matplotlib and pandas for cost trend plots:")
         print("pip3 install matplotlib pandas")
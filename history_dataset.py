@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Date-partitioned Parquet dataset of the voltage history CSV
+Shared by analyze_logs.py and cost_analysis.py; kept in step with the CSV incrementally
+"""
+
+import glob
+import json
+import os
+import shutil
+from config import MONITOR_INTERVAL, MONITOR_INTERVAL_MAX
+
+# Columns stored in the dataset - everything the analysis tools read
+DATASET_COLUMNS = [
+    'timestamp', 'voltage', 'charger_connected', 'solar_detected',
+    'in_preferred_hours', 'in_avoid_hours', 'charging_decision',
+    'rate_type', 'current_rate_cents'
+]
+
+# Inside the dataset (ignored by Parquet readers): CSV file identity and bytes synced so far
+SYNC_STATE_FILE = "_sync_state.json"
+
+def dataset_dir_for(csv_file):
+    """Directory of the date-partitioned Parquet copy of a CSV log"""
+    return os.path.splitext(csv_file)[0] + "_dataset"
+
+def csv_tail(csv_file, offset):
+    """Header line and the complete lines from byte `offset` on, plus the offset they end at"""
+    with open(csv_file, 'rb') as f:
+        header = f.readline()
+        offset = max(offset, len(header))
+        f.seek(offset)
+        data = f.read()
+    # A partly written last line is left for the next sync
+    end = data.rfind(b'\n') + 1
+    return header, data[:end], offset + end
+
+def unsynced_csv_chunks(csv_file, state):
+    """(header, lines) chunks of the CSV past a sync state, and the state after them
+    
+    The state records the file (device, inode) and how many bytes of it were
+    synced; the monitor only ever appends, so everything before that offset is
+    unchanged. After a monthly logrotate (delaycompress) the rest of the old
+    file is read from its .1 name before the new file is read from the start.
+    """
+    stat = os.stat(csv_file)
+    identity = [stat.st_dev, stat.st_ino]
+    chunks = []
+    offset = 0
+    if state is not None:
+        if state['file'] == identity:
+            # A shorter file than the synced offset was truncated - start over
+            offset = state['offset'] if stat.st_size >= state['offset'] else 0
+        else:
+            rotated = csv_file + ".1"
+            try:
+                rotated_stat = os.stat(rotated)
+                if [rotated_stat.st_dev, rotated_stat.st_ino] == state['file']:
+                    header, data, _ = csv_tail(rotated, state['offset'])
+                    chunks.append((header, data))
+            except OSError:
+                pass
+    
+    header, data, offset = csv_tail(csv_file, offset)
+    chunks.append((header, data))
+    state = {'file': identity, 'offset': offset, 'columns': DATASET_COLUMNS}
+    return [chunk for chunk in chunks if chunk[1]], state
+
+def load_sync_state(state_file):
+    """Sync state saved by the last run, or None"""
+    try:
+        with open(state_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_sync_state(state_file, state):
+    """Write the sync state atomically (temp file + rename)"""
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+def parse_history_csv(source, columns=None):
+    """Parse a CSV path or buffer into a pyarrow Table with the dataset schema"""
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    
+    # Explicit schema lets Arrow's multithreaded reader parse timestamps natively;
+    # the few distinct decision/rate strings are stored as dictionary codes
+    convert_options = pacsv.ConvertOptions(
+        include_columns=columns or DATASET_COLUMNS,
+        column_types={
+            'timestamp': pa.timestamp('us'),
+            'voltage': pa.float32(),
+            'charger_connected': pa.bool_(),
+            'solar_detected': pa.bool_(),
+            'in_preferred_hours': pa.bool_(),
+            'in_avoid_hours': pa.bool_(),
+            'charging_decision': pa.dictionary(pa.int32(), pa.string()),
+            'rate_type': pa.dictionary(pa.int32(), pa.string()),
+            'current_rate_cents': pa.float32(),
+        }
+    )
+    return pacsv.read_csv(
+        source,
+        read_options=pacsv.ReadOptions(use_threads=True),
+        convert_options=convert_options
+    )
+
+def merge_into_partitions(table, dataset_dir):
+    """Add rows to their date partitions; each partition stays one file, replaced atomically"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    
+    dates = pc.strftime(table['timestamp'], format='%Y-%m-%d')
+    for day in pc.unique(dates).to_pylist():
+        rows = table.filter(pc.equal(dates, day))
+        partition = os.path.join(dataset_dir, f"date={day}")
+        part_file = os.path.join(partition, "part-0.parquet")
+        os.makedirs(partition, exist_ok=True)
+        
+        if os.path.exists(part_file):
+            existing = pq.read_table(part_file).cast(rows.schema)
+            # Timestamps are logged to the microsecond, so one already stored means the
+            # same row (a sync cut short before its state was saved, overlapping archives)
+            rows = rows.filter(pc.invert(pc.is_in(rows['timestamp'], value_set=existing['timestamp'])))
+            if rows.num_rows == 0:
+                continue
+            rows = pa.concat_tables([existing, rows])
+        
+        # Readers see either the old file or the new one, never a partial write
+        tmp_file = os.path.join(partition, ".part-0.parquet.tmp")  # Hidden from dataset reads
+        pq.write_table(rows, tmp_file, compression='zstd')
+        os.replace(tmp_file, part_file)
+
+def sync_dataset(csv_file, dataset_dir):
+    """Append CSV rows not yet in the dataset to it, one partition per date"""
+    import pyarrow as pa
+    
+    os.makedirs(dataset_dir, exist_ok=True)
+    state_file = os.path.join(dataset_dir, SYNC_STATE_FILE)
+    state = load_sync_state(state_file)
+    stale_files = [path for path in glob.glob(os.path.join(dataset_dir, "date=*", "*.parquet"))
+                   if os.path.basename(path) != "part-0.parquet"]
+    if (state is not None and state.get('columns') != DATASET_COLUMNS) or stale_files:
+        # Written by an older version (other columns, several files per day) - start
+        # over; run migrate_csv_to_parquet.py to bring the archived months back
+        print(f"Rebuilding {dataset_dir} for the current layout")
+        for partition in glob.glob(os.path.join(dataset_dir, "date=*")):
+            shutil.rmtree(partition)
+        if state is not None:
+            os.remove(state_file)
+        state = None
+    
+    if csv_file.endswith('.gz'):
+        # Compressed archive (migration): no byte offsets - parse it whole
+        tables = [parse_history_csv(csv_file)]
+        new_state = None
+    else:
+        # Only the part of the CSV appended since the last sync is parsed
+        chunks, new_state = unsynced_csv_chunks(csv_file, state)
+        tables = [parse_history_csv(pa.BufferReader(header + data)) for header, data in chunks]
+    
+    if tables:
+        # No "newer than the dataset" filter: rows logged after the clock stepped
+        # back (NTP, RTC-less boot) are still new - the byte offset says what is
+        merge_into_partitions(pa.concat_tables(tables), dataset_dir)
+    
+    if new_state is not None:
+        save_sync_state(state_file, new_state)
+
+def latest_timestamp(dataset_dir):
+    """Newest timestamp in the dataset (a datetime), or None if it is empty"""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    
+    # Only the newest date partition can hold it
+    partitions = sorted(glob.glob(os.path.join(dataset_dir, "date=*")))
+    if not partitions:
+        return None
+    return pc.max(pq.read_table(partitions[-1], columns=['timestamp'])['timestamp']).as_py()
+
+def read_dataset(dataset_dir, columns, since=None):
+    """Read columns of the dataset (rows from `since` on) in time order, or None if it is empty"""
+    import pyarrow.parquet as pq
+    
+    if not glob.glob(os.path.join(dataset_dir, "date=*")):
+        return None
+    filters = None
+    if since is not None:
+        # The date filter prunes whole partitions; the timestamp filter trims the first day
+        filters = [('date', '>=', since.strftime('%Y-%m-%d')), ('timestamp', '>=', since)]
+    return pq.read_table(dataset_dir, columns=columns, filters=filters).sort_by('timestamp')
+
+def record_seconds(timestamps):
+    """Seconds of monitoring each row stands for: the time until the next reading
+    
+    The monitor backs off to MONITOR_INTERVAL_MAX while the voltage holds steady,
+    so rows are not evenly spaced and have to be weighted rather than counted.
+    A longer gap (monitor stopped) or a backwards clock step counts as one normal
+    interval, and so does the newest row.
+    """
+    import numpy as np
+    
+    seconds = np.full(len(timestamps), float(MONITOR_INTERVAL))
+    gaps = np.diff(np.asarray(timestamps, dtype='datetime64[us]').astype(np.int64)) / 1e6
+    # A backed-off cycle runs a little past its interval (read timeout, CSV flush)
+    normal = (gaps > 0) & (gaps <= MONITOR_INTERVAL_MAX + MONITOR_INTERVAL)
+    seconds[:-1] = np.where(normal, gaps, MONITOR_INTERVAL)
+    return seconds
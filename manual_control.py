@@ -8,8 +8,14 @@ import serial
 import time
 import sys
 import os
+import functools
 from config import RELAY_PIN, SERIAL_PORTS, BAUD_RATE
 
+# Port found by discovery, shared with later invocations (tmpfs, cleared on reboot)
+PORT_CACHE_FILE = f"/run/user/{os.getuid()}/battery-monitor.port"
+
+READ_TIMEOUT = 3  # Seconds to wait for a V line (about three VE.Direct frames)
+
 def setup():
     GPIO.setmode(GPIO.BCM)
     GPIO.setup(RELAY_PIN, GPIO.OUT)
@@ -40,26 +46,66 @@ def find_usb_device():
     print(error_msg)
     raise Exception(error_msg)
     
-def read_voltage():
-    """Read current voltage"""
+@functools.lru_cache(maxsize=1)
+def cached_usb_device():
+    """Serial port to use - from the port cache file if valid, else by discovery"""
+    try:
+        with open(PORT_CACHE_FILE) as f:
+            port = f.read().strip()
+        if port and os.path.exists(port):
+            return port
+    except OSError:
+        pass
+    
+    port = find_usb_device()
+    try:
+        with open(PORT_CACHE_FILE, 'w') as f:
+            f.write(port + '\n')
+    except OSError:
+        pass  # No runtime dir (e.g. run from cron) - just don't share it
+    return port
+
+def forget_usb_device():
+    """Drop the cached port so the next lookup probes again"""
+    cached_usb_device.cache_clear()
     try:
-        serial_port = find_usb_device()
-        ser = serial.Serial(serial_port, baudrate=BAUD_RATE, timeout=2)
-        ser.flushInput()
+        os.remove(PORT_CACHE_FILE)
+    except OSError:
+        pass
+
+def open_serial():
+    """Open the cached serial port, re-running discovery once if it stopped working"""
+    try:
+        return serial.Serial(cached_usb_device(), baudrate=BAUD_RATE, timeout=2)
+    except serial.SerialException:
+        forget_usb_device()
+        return serial.Serial(cached_usb_device(), baudrate=BAUD_RATE, timeout=2)
+    
+def read_voltage(ser=None):
+    """Read current voltage (from an already-open port if one is given)"""
+    own_port = ser is None
+    try:
+        if own_port:
+            ser = open_serial()
+        ser.flushInput()  # One-shot read: skip anything buffered before this command
         
-        for _ in range(10):
-            line = ser.readline().decode('utf-8', errors='ignore').strip()
-            if line.startswith("V"):
-                mv = int(line.split("\t")[1])
+        # VE.Direct repeats its frame every second; give up after a few frames
+        deadline = time.monotonic() + READ_TIMEOUT
+        while time.monotonic() < deadline:
+            # Check the field name on the raw bytes; only the V line gets parsed
+            raw = ser.read_until(b'\n')
+            if raw.startswith(b'V\t'):
+                mv = int(raw[2:])  # int() accepts bytes and ignores the trailing \r\n
                 voltage = mv / 1000.0
-                ser.close()
                 return voltage
         
-        ser.close()
         return None
     except Exception as e:
         print(f"Error reading voltage: {e}")
         return None
+    finally:
+        if own_port and ser is not None:
+            ser.close()
 
 def connect_charger():
     """Connect charger (relay OFF)"""
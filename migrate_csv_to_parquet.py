@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+One-time migration of voltage history CSV files to the Parquet dataset
+read by cost_analysis.py and analyze_logs.py (date-partitioned, one directory per day)
+"""
+
+import glob
+import os
+import re
+import sys
+from history_dataset import dataset_dir_for, sync_dataset
+
+CSV_FILE = "/home/erictran/Script/voltage_history.csv"
+
+def rotated_history_files(csv_file):
+    """The live CSV plus its logrotate archives (.1, .2.gz, ...), oldest first"""
+    def rotation_number(path):
+        match = re.match(re.escape(csv_file) + r"\.(\d+)", path)
+        return int(match.group(1)) if match else 0
+
+    archives = [path for path in glob.glob(csv_file + ".*") if rotation_number(path)]
+    archives.sort(key=rotation_number, reverse=True)
+    return archives + [csv_file]
+
+def main():
+    # Files must be given oldest first: each sync only appends rows newer than the dataset
+    csv_files = sys.argv[1:] or rotated_history_files(CSV_FILE)
+    dataset_dir = dataset_dir_for(CSV_FILE)
+
+    try:
+        import pyarrow
+    except ImportError:
+        print("? pyarrow is required for the Parquet dataset:")
+        print("pip3 install pyarrow")
+        return
+
+    for csv_file in csv_files:
+        if not os.path.exists(csv_file):
+            print(f"? Skipping missing file: {csv_file}")
+            continue
+        print(f"? Migrating {csv_file}...")
+        try:
+            sync_dataset(csv_file, dataset_dir)
+        except Exception as e:
+            print(f"? Failed to migrate {csv_file}: {e}")
+            return
+
+    partitions = glob.glob(os.path.join(dataset_dir, "date=*"))
+    print(f"? Dataset ready: {dataset_dir} ({len(partitions)} days)")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
 import RPi.GPIO as GPIO
-import time
+import threading
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(17, GPIO.OUT)
+RELAY_PIN = 17
 
-print("Relay ON")
-GPIO.output(17, GPIO.LOW)   # Many modules are active LOW
-time.sleep(2)
+def pulse(pin=RELAY_PIN, duration=2.0):
+    """Switch the relay on for `duration` seconds without blocking the caller.
 
-print("Relay OFF")
-GPIO.output(17, GPIO.HIGH)
-GPIO.cleanup()
+    Returns the started Timer - call .join() to wait for the relay to switch off.
+    """
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(pin, GPIO.OUT)
+
+    print("Relay ON")
+    GPIO.output(pin, GPIO.LOW)   # Many modules are active LOW
+
+    def release():
+        print("Relay OFF")
+        GPIO.output(pin, GPIO.HIGH)
+        GPIO.cleanup(pin)
+
+    timer = threading.Timer(duration, release)
+    timer.start()
+    return timer
+
+if __name__ == "__main__":
+    pulse().join()
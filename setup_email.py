@@ -9,7 +9,8 @@ import smtplib
 from email.mime.text import MIMEText
 
 def test_email_connection(smtp_server, smtp_port, email_from, email_password, email_to):
-    """Test email configuration"""
+    """Test email configuration (email_to: one address or a list)"""
+    recipients = email_to if isinstance(email_to, list) else [email_to]
     try:
         print("Testing email connection...")
         
@@ -17,14 +18,14 @@ def test_email_connection(smtp_server, smtp_port, email_from, email_password, em
         msg = MIMEText("This is a test message from your RV Battery Monitor setup.")
         msg['Subject'] = "? RV Battery Monitor - Email Test"
         msg['From'] = email_from
-        msg['To'] = email_to
+        msg['To'] = ', '.join(recipients)
         
         # Send test email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_from, email_password)
-        server.sendmail(email_from, [email_to], msg.as_string())
-        server.quit()
+        with smtplib.SMTP(smtp_server, smtp_port) as server:
+            server.starttls()
+            server.login(email_from, email_password)
+            # One transaction for every recipient - the server fans it out
+            server.send_message(msg, from_addr=email_from, to_addrs=recipients)
         
         print("? Email test successful!")
         return True
@@ -60,7 +61,7 @@ def setup_gmail_config():
     # Test configuration
     print("\nTesting email configuration...")
     success = test_email_connection(
-        "smtp.gmail.com", 587, email_from, email_password, email_to_list[0]
+        "smtp.gmail.com", 587, email_from, email_password, email_to_list
     )
     
     if success:
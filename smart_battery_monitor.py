@@ -11,99 +11,348 @@ import RPi.GPIO as GPIO
 import serial
 import time
 import logging
+import logging.handlers
 import csv
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, time as dt_time, timedelta
-from collections import deque
+from datetime import datetime, date, time as dt_time, timedelta
+from collections import deque, namedtuple, OrderedDict
+from functools import lru_cache
 import os
+import atexit
+import select
+import threading
+import queue
+import itertools
+import bisect
+import json
+import tempfile
+from statistics import fmean
 
 # Import configuration
 from config import *
 
+# Column layout of VOLTAGE_LOG_FILE
+CSV_HEADER = [
+    'timestamp', 'voltage', 'charger_connected', 'solar_detected',
+    'in_preferred_hours', 'in_avoid_hours', 'charging_decision',
+    'rate_type', 'current_rate_cents', 'has_ev_credit', 'utility_season', 
+    'monthly_season', 'solar_factor', 'is_weekend'
+]
+
+# Everything the solar detectors need, computed once per detection pass
+SolarFeatures = namedtuple('SolarFeatures', [
+    'n_samples',         # Readings in the voltage history
+    'last_voltage',      # Most recent reading (V)
+    'trend_rate',        # V/hour over the last 10 readings (None if no time elapsed)
+    'load_rate',         # V/hour over the last 20 readings (None if no time elapsed)
+    'plateau_duration',  # Seconds between first and last reading above SOLAR_PLATEAU_THRESHOLD
+    'is_daylight',       # Result of the time-based detector
+])
+
+READ_TIMEOUT = 2               # Seconds to wait for a voltage line per read
+MAX_PARTIAL_LINE = 4096        # Drop a partial line longer than this (garbage on the wire)
+INVERTER_RESET_RECHECK = 3600  # Longest inverter reset timer - the wall clock is re-read at least this often
+
+def utility_season(month):
+    """Utility billing season for a month: summer (June-September) or winter"""
+    return 'summer' if 6 <= month <= 9 else 'winter'
+
+# Month-indexed like the config tables (index 0 unused)
+UTILITY_SEASON_BY_MONTH = tuple(utility_season(m) for m in range(13))
+
+def compute_rate_info(current_hour, is_weekend, season):
+    """(rate_type, rate, has_ev_credit) for an hour, day type and utility season"""
+    # EV credit applies midnight-6AM every day
+    has_ev_credit = 0 <= current_hour < 6
+    
+    if is_weekend:
+        # Weekends and holidays are all off-peak
+        rate_type = "off_peak_weekend"
+        rate = RATE_INFO[season]['off_peak']
+    else:
+        # Weekday rates based on your TOD schedule
+        if season == 'summer':
+            if 0 <= current_hour < 12:  # Midnight-noon
+                rate_type = "off_peak"
+                rate = RATE_INFO[season]['off_peak']
+            elif 12 <= current_hour < 17:  # Noon-5PM
+                rate_type = "mid_peak"
+                rate = RATE_INFO[season]['mid_peak']
+            elif 17 <= current_hour < 20:  # 5PM-8PM (PEAK - most expensive!)
+                rate_type = "peak"
+                rate = RATE_INFO[season]['peak']
+            else:  # 8PM-midnight
+                rate_type = "off_peak"
+                rate = RATE_INFO[season]['off_peak']
+        else:  # winter
+            if 17 <= current_hour < 20:  # 5PM-8PM (PEAK)
+                rate_type = "peak"
+                rate = RATE_INFO[season]['peak']
+            else:  # All other hours are off-peak in winter
+                rate_type = "off_peak"
+                rate = RATE_INFO[season]['off_peak']
+    
+    # Apply EV credit if applicable (negative cost!)
+    if has_ev_credit:
+        rate += RATE_INFO[season]['ev_credit']  # EV credit is negative
+        rate_type += "_with_ev_credit"
+        
+    return rate_type, rate, has_ev_credit
+
+# Every rate the schedule can produce, folded once at import:
+# RATE_TABLE[season][is_weekend][hour] -> (rate_type, rate, has_ev_credit)
+RATE_TABLE = {
+    season: tuple(tuple(compute_rate_info(hour, is_weekend, season) for hour in range(24))
+                  for is_weekend in (False, True))
+    for season in ('summer', 'winter')
+}
+
+def rate_info_for(current_hour, is_weekend, month):
+    """(rate_type, rate, has_ev_credit) for an hour, day type and month"""
+    return RATE_TABLE[UTILITY_SEASON_BY_MONTH[month]][is_weekend][current_hour]
+
+# Charging period of each hour of the day, as used by should_charge
+HOUR_PERIOD = tuple(
+    'ev_credit' if hour < 6 else      # 12AM-6AM: EV credit, cheapest
+    'morning' if hour < 10 else       # 6AM-10AM: after EV credit, before solar
+    'evening' if hour >= 20 else      # 8PM-midnight: wait for EV credit
+    'day'
+    for hour in range(24)
+)
+
+@lru_cache(maxsize=512)
+def format_fixed(value, digits):
+    """value formatted with `digits` decimals - cached, CSV values repeat from row to row"""
+    return f"{value:.{digits}f}"
+
+def is_preferred_hour(current_hour, is_weekend):
+    """Check if an hour is a preferred charging hour"""
+    # Weekends have off-peak rates all day, but still use strategic timing
+    # Only treat EV credit hours as truly "preferred" on weekends
+    if is_weekend:
+        # EV credit hours are preferred even on weekends (cheapest rates)
+        # Other weekend hours are "acceptable" but not "preferred"
+        return 0 <= current_hour < 6
+        
+    # Check preferred hours for weekdays (bitmask built from PREFERRED_CHARGING_HOURS)
+    return bool((PREFERRED_HOURS_MASK >> current_hour) & 1)
+
+def is_avoid_hour(current_hour, is_weekend):
+    """Check if an hour is in avoid charging hours (peak rates)"""
+    # Weekends never have peak rates
+    if is_weekend:
+        return False
+        
+    # Check avoid hours for weekdays only (5PM-8PM peak rates)
+    return bool((AVOID_HOURS_MASK >> current_hour) & 1)
+
+# Voltage status bands: a voltage at or below a threshold gets the status at the same index
+# (thresholds in increasing order; anything above the last one is HIGH)
+VOLTAGE_STATUS_THRESHOLDS = (CRITICAL_VOLTAGE_THRESHOLD, EMERGENCY_VOLTAGE_THRESHOLD,
+                             LOW_VOLTAGE_PRIORITY_THRESHOLD, NORMAL_VOLTAGE_THRESHOLD)
+VOLTAGE_STATUSES = ("CRITICAL", "EMERGENCY", "LOW", "NORMAL", "HIGH")
+
+# Rough load (kW) behind each _estimate_current_load_level() result, for runtime estimates
+LOAD_KW_BY_LEVEL = {
+    "minimal": 0.1, "light": 0.5, "typical": 1.0, "heavy": 1.5, "unknown": 1.0
+}
+
+# Fixed end of every alert email - built once from the system settings
+EMAIL_FOOTER = f"""- Inverter Cutoff: {INVERTER_CUTOFF_VOLTAGE}V
+
+Battery System: {BATTERY_CAPACITY_KWH}kWh capacity
+Typical Load: {TYPICAL_LOAD_KW}kW
+
+This is an automated alert from your RV Battery Monitor.
+            """
+
+# Common unicode characters and their ASCII equivalents in email text
+ASCII_REPLACEMENTS = str.maketrans({
+    '\xa0': ' ',  # Non-breaking space
+    '\u2022': '-',  # Bullet point
+    '\u2013': '-',  # En dash
+    '\u2014': '-',  # Em dash
+    '\u2018': "'",  # Left single quote
+    '\u2019': "'",  # Right single quote
+    '\u201c': '"',  # Left double quote
+    '\u201d': '"',  # Right double quote
+    '🔴': 'CRITICAL',
+    '🟠': 'EMERGENCY',
+    '🟡': 'LOW',
+    '🟢': 'NORMAL',
+    '🔵': 'HIGH'
+})
+
+def clean_ascii(text):
+    """text with known unicode characters replaced and any other non-ASCII character as '?'"""
+    return text.translate(ASCII_REPLACEMENTS).encode('ascii', 'replace').decode('ascii')
+
+class ChargeRiseTracker:
+    """Voltage rise over one charging window - shared by the charging failure and stall checks"""
+    def __init__(self, check_minutes):
+        self.check_seconds = check_minutes * 60
+        self.start_time = None
+        self.start_voltage = None
+    
+    def start(self, now_ts, voltage):
+        """Open a window at this reading"""
+        self.start_time = now_ts
+        self.start_voltage = voltage
+    
+    def reset(self):
+        """Drop the current window (the next reading opens a new one)"""
+        self.start_time = None
+        self.start_voltage = None
+    
+    def rise(self, now_ts, voltage):
+        """(elapsed_minutes, voltage_increase) once the window is long enough, else None"""
+        # Compared in seconds - minutes are only needed past this point
+        elapsed = now_ts - self.start_time
+        if elapsed < self.check_seconds:
+            return None
+        return elapsed / 60, voltage - self.start_voltage
+
 class SmartBatteryMonitor:
     def __init__(self):
         self.setup_logging()
         self.setup_gpio()
+        self.serial_buffer = bytearray()  # Unparsed VE.Direct bytes carried between reads
+        self.serial_port = None           # Last port that opened successfully
         self.setup_serial()
         
         # State tracking - read actual relay state instead of assuming
         self.charger_connected = self.read_relay_state()
         self.last_voltage = 0.0
-        self.voltage_history = deque(maxlen=int(SOLAR_DETECTION_WINDOW / MONITOR_INTERVAL))
+        # Voltage history as parallel columns (timestamps, volts) for solar/load detection
+        history_len = int(SOLAR_DETECTION_WINDOW / MONITOR_INTERVAL)
+        self.history_times = deque(maxlen=history_len)
+        self.history_voltages = deque(maxlen=history_len)
+        self.solar_features_cache = (None, None)  # (cycle/history key, SolarFeatures)
         self.last_detailed_log = 0
         self.solar_detected = False
         self.first_decision = True  # Flag to enforce strict thresholds on first decision
         
         # Charger toggle tracking (detect rapid oscillation)
         self.charger_state_changes = deque(maxlen=10)  # Track last 10 state changes with timestamps
-        self.last_rapid_toggle_alert = None  # Track when we last sent rapid toggle alert
-        
-        # Email notification tracking
-        self.last_email_alert = None
-        self.last_email_critical = None
-        self.last_email_recovery = None
-        self.last_email_high_voltage = None
-        self.last_email_critical_high = None
-        self.last_email_comm_failure = None
-        self.voltage_alert_sent = False
-        self.voltage_critical_sent = False
-        self.voltage_high_sent = False
-        self.voltage_critical_high_sent = False
-        self.comm_failure_sent = False
-        
-        # Recovery notification flags - prevent multiple recovery emails
-        self.recovery_email_sent = False
+        
+        # Email alert tracking: category -> (last_sent_timestamp, suppressed_repeats)
+        # A category stays in the cache while its condition is active; recovery clears it
+        self.alert_cache = self.load_alert_state()
+        # (subject, message) -> send time of recent emails, oldest first (capped at 32)
+        self.recent_emails = OrderedDict()
+        self.smtp_connection = None  # Logged-in SMTP session kept open between emails
+        self.smtp_lock = threading.RLock()  # Sender thread and test emails share the session
+        self.smtp_last_used = 0
+        self.smtp_messages_sent = 0
+        
+        # Emails go out from a worker thread so a slow SMTP server never stalls the loop
+        # Entries are (priority, sequence, email): critical first, otherwise in queued order
+        self.email_queue = queue.PriorityQueue(maxsize=16)
+        self.email_sequence = itertools.count()
+        threading.Thread(target=self.email_worker, name="email-sender", daemon=True).start()
         
         # Communication failure tracking
         self.last_successful_voltage_read = time.time()
         self.consecutive_read_failures = 0
         
-        # Inverter reset tracking
+        # Inverter reset tracking - a timer thread flags the daily reset, the main loop runs it
         self.last_inverter_reset_date = None
+        self.inverter_reset_timer = None
+        self.next_inverter_reset = None  # Reset time the timer is armed for (logged when it changes)
+        self.inverter_reset_due = threading.Event()  # Set by the timer; also wakes the loop's sleep
+        self.inverter_lock = threading.Lock()  # One inverter power-cycle at a time
         
         # Charging failure detection tracking
-        self.ev_charging_start_time = None
-        self.ev_charging_start_voltage = None
-        self.last_charging_failure_alert = None
+        self.ev_charging_tracker = ChargeRiseTracker(CHARGING_FAILURE_CHECK_MINUTES)
         
         # Internet connectivity health check tracking
         self.last_internet_check = 0
         self.consecutive_internet_failures = 0
-        self.last_internet_failure_alert = None
         
         # Voltage stall detection tracking
-        self.voltage_stall_start_time = None
-        self.voltage_stall_start_voltage = None
-        self.last_voltage_stall_alert = None
+        self.voltage_stall_tracker = ChargeRiseTracker(VOLTAGE_STALL_CHECK_MINUTES)
+        
+        # Clock read once per monitor cycle so all time-of-day checks agree
+        self.tick_now = None
+        self.tick_ts = None
+        self.clock_key_cache = (None, None)  # (tick_now, (hour, is_weekend, month))
+        
+        # Adaptive check interval - backs off while the voltage holds steady
+        self.monitor_interval = MONITOR_INTERVAL
+        self.stable_reads = 0
+        
+        # Holidays parsed once - weekend rates apply on these dates
+        self.holidays = self.parse_holidays()
+        self.day_type_cache = (None, False)  # (date, is_weekend_or_holiday) - changes at midnight
+        
+        # Camping periods parsed once: (start_date, end_date, voltage_threshold)
+        self.camping_periods = self.parse_camping_periods()
         
-        # CSV logging setup
+        # CSV logging setup - rows are buffered and appended in batches
+        self.csv_buffer = []
+        self.csv_file = None       # Long-lived append handle (reopened after logrotate)
+        self.csv_file_id = None    # (st_dev, st_ino) of the file csv_file points at
+        self.last_csv_flush = time.time()
         if ENABLE_CSV_LOGGING:
             self.setup_csv_logging()
             
     def setup_logging(self):
         """Initialize logging system"""
+        # WatchedFileHandler reopens the file after logrotate moves it;
+        # the MemoryHandler in front batches INFO records into fewer writes
+        # but flushes immediately on warnings and errors (and on a timer, see flush_log)
+        file_handler = logging.handlers.WatchedFileHandler(LOG_FILE)
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self.last_log_flush = time.time()
+        self.log_buffer = buffered_handler = logging.handlers.MemoryHandler(
+            capacity=LOG_BUFFER_RECORDS,
+            flushLevel=logging.WARNING,
+            target=file_handler
+        )
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
             handlers=[
-                logging.FileHandler(LOG_FILE),
+                buffered_handler,
                 logging.StreamHandler()
             ]
         )
         
+    def flush_log(self):
+        """Write buffered log records once they are LOG_FLUSH_SECONDS old (called every cycle)"""
+        if time.time() - self.last_log_flush >= LOG_FLUSH_SECONDS:
+            self.log_buffer.flush()
+            self.last_log_flush = time.time()
+        
     def setup_csv_logging(self):
         """Setup CSV logging for voltage history"""
-        if not os.path.exists(VOLTAGE_LOG_FILE):
-            with open(VOLTAGE_LOG_FILE, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow([
-                    'timestamp', 'voltage', 'charger_connected', 'solar_detected',
-                    'in_preferred_hours', 'in_avoid_hours', 'charging_decision',
-                    'rate_type', 'current_rate_cents', 'has_ev_credit', 'utility_season', 
-                    'monthly_season', 'solar_factor', 'is_weekend'
-                ])
+        self.open_csv()
+        # Don't lose buffered rows if the process exits without cleanup()
+        atexit.register(self.flush_csv)
+    
+    def open_csv(self):
+        """Return the CSV append handle, reopening it if logrotate replaced the file"""
+        try:
+            stat = os.stat(VOLTAGE_LOG_FILE)
+            file_id = (stat.st_dev, stat.st_ino)
+        except FileNotFoundError:
+            file_id = None
+        if self.csv_file is not None and file_id == self.csv_file_id:
+            return self.csv_file
+        
+        if self.csv_file is not None:
+            self.csv_file.close()
+        self.csv_file = open(VOLTAGE_LOG_FILE, 'a', newline='', buffering=1 << 16)
+        stat = os.fstat(self.csv_file.fileno())
+        self.csv_file_id = (stat.st_dev, stat.st_ino)
+        self.csv_writer = csv.writer(self.csv_file)
+        
+        # New or freshly rotated (empty) file - start it with the header
+        if stat.st_size == 0:
+            self.csv_writer.writerow(CSV_HEADER)
+        return self.csv_file
                 
     def log_to_csv(self, voltage, charging_decision):
         """Log data to CSV file with rate information"""
@@ -111,28 +360,52 @@ class SmartBatteryMonitor:
             return
             
         try:
-            rate_type, current_rate, has_ev_credit = self.get_current_rate_info()
-            
-            with open(VOLTAGE_LOG_FILE, 'a', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow([
-                    datetime.now().isoformat(),
-                    f"{voltage:.3f}",
-                    self.charger_connected,
-                    self.solar_detected,
-                    self.is_preferred_charging_time(),
-                    self.is_avoid_charging_time(),
-                    charging_decision,
-                    rate_type,
-                    f"{current_rate:.2f}",
-                    has_ev_credit,
-                    self.get_current_season(),  # Utility season for rates
-                    self.get_monthly_season_name(),  # Descriptive monthly season
-                    f"{self.get_solar_factor():.2f}",  # Solar generation factor
-                    self.is_weekend_or_holiday()
-                ])
+            # One clock reading (the cycle's) for every time-of-day column
+            now = self.current_datetime()
+            hour, is_weekend, month = self._clock_key()
+            rate_type, current_rate, has_ev_credit = rate_info_for(hour, is_weekend, month)
+            
+            self.csv_buffer.append([
+                now.isoformat(),
+                format_fixed(voltage, 3),
+                self.charger_connected,
+                self.solar_detected,
+                is_preferred_hour(hour, is_weekend),
+                is_avoid_hour(hour, is_weekend),
+                charging_decision,
+                rate_type,
+                format_fixed(current_rate, 2),
+                has_ev_credit,
+                UTILITY_SEASON_BY_MONTH[month],  # Utility season for rates
+                SEASON_NAME_BY_MONTH[month],  # Descriptive monthly season
+                format_fixed(SOLAR_FACTOR_BY_MONTH[month], 2),  # Solar generation factor
+                is_weekend
+            ])
+            if (len(self.csv_buffer) >= CSV_FLUSH_ROWS or
+                    time.time() - self.last_csv_flush >= CSV_FLUSH_SECONDS):
+                self.flush_csv()
+        except Exception as e:
+            logging.error(f"Failed to write to CSV: {e}")
+    
+    def flush_csv(self):
+        """Append all buffered CSV rows in a single write"""
+        self.last_csv_flush = time.time()
+        if not self.csv_buffer:
+            return
+        try:
+            csvfile = self.open_csv()
+            self.csv_writer.writerows(self.csv_buffer)
+            csvfile.flush()
+            self.csv_buffer.clear()
         except Exception as e:
             logging.error(f"Failed to write to CSV: {e}")
+    
+    def close_csv(self):
+        """Flush buffered rows and close the CSV handle"""
+        self.flush_csv()
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
             
     def setup_gpio(self):
         """Initialize GPIO for relay control"""
@@ -154,21 +427,28 @@ class SmartBatteryMonitor:
             logging.warning(f"Could not read relay state, defaulting to connected: {e}")
             return True  # Safe default
         
-    def find_usb_device(self):
-        """Find the first available USB serial device"""
-        for port in SERIAL_PORTS:
-            if os.path.exists(port):
-                try:
-                    # Try to open the device briefly to verify it's accessible
-                    test_ser = serial.Serial(port, baudrate=BAUD_RATE, timeout=1)
-                    test_ser.close()
-                    logging.info(f"Found available USB device: {port}")
-                    return port
-                except Exception as e:
-                    logging.debug(f"USB device {port} not accessible: {e}")
-                    continue
-            else:
-                logging.debug(f"USB device {port} does not exist")
+    def connect_serial(self):
+        """Open the last good serial port, scanning SERIAL_PORTS only if that fails"""
+        # The real open is the accessibility check - no separate probe open/close
+        candidates = [port for port in SERIAL_PORTS if port != self.serial_port]
+        if self.serial_port:
+            candidates.insert(0, self.serial_port)
+        
+        for port in candidates:
+            if not os.path.exists(port):
+                logging.debug("USB device %s does not exist", port)
+                continue
+            previous_port = self.serial_port
+            self.serial_port = port
+            try:
+                self.open_serial()
+            except Exception as e:
+                logging.debug("USB device %s not accessible: %s", port, e)
+                self.serial_port = previous_port
+                continue
+            if previous_port and port != previous_port:
+                logging.info(f"USB device changed from {previous_port} to {port}")
+            return port
         
         # If no devices found, raise an error
         available_ports = [port for port in SERIAL_PORTS if os.path.exists(port)]
@@ -183,47 +463,90 @@ class SmartBatteryMonitor:
     def setup_serial(self):
         """Initialize serial connection for voltage reading"""
         try:
-            self.serial_port = self.find_usb_device()
-            self.ser = serial.Serial(self.serial_port, baudrate=BAUD_RATE, timeout=2)
+            self.connect_serial()
             logging.info(f"Serial connection established on {self.serial_port}")
         except Exception as e:
             logging.error(f"Failed to setup serial connection: {e}")
             raise
+    
+    def open_serial(self):
+        """Open self.serial_port, asking the USB-serial driver for low-latency mode"""
+        self.ser = serial.Serial(self.serial_port, baudrate=BAUD_RATE, timeout=2)
+        self.serial_buffer.clear()
+        try:
+            # ASYNC_LOW_LATENCY via TIOCSSERIAL: FTDI-style adapters otherwise
+            # hold received bytes for up to 16 ms before passing them on
+            self.ser.set_low_latency_mode(True)
+        except (AttributeError, NotImplementedError, OSError, ValueError) as e:
+            logging.debug("Low-latency mode not available on %s: %s", self.serial_port, e)
             
     def read_voltage(self, recovery_attempt=False):
         """Read voltage from VE.Direct protocol"""
         try:
-            self.ser.flushInput()
+            deadline = time.monotonic() + READ_TIMEOUT
+            buf = self.serial_buffer
+            voltage = None
             
-            # Try more attempts since VE.Direct sends continuous data
-            for attempt in range(50):  # Increased from 10 to 50
-                line = self.ser.readline().decode('utf-8', errors='ignore').strip()
+            fd = self.ser.fileno()
+            
+            # Don't flush the input: buffered frames already hold valid readings
+            while True:
+                # One kernel wait for data (or the deadline), then one read of whatever arrived
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([fd], [], [], remaining)
+                if not readable:
+                    break
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    # Readable but empty: the USB adapter went away (same wording as pyserial,
+                    # which the reconnect logic below looks for)
+                    raise serial.SerialException("device reports readiness to read but returned no data")
+                buf.extend(chunk)
+                
+                # Parse every complete line, keeping the most recent voltage
+                start = 0
+                while True:
+                    end = buf.find(b'\n', start)
+                    if end < 0:
+                        break
+                    # VE.Direct is ASCII: match and parse the raw bytes, no decode
+                    if buf.startswith(b'V\t', start, end):
+                        try:
+                            voltage = int(buf[start + 2:end]) / 1000.0  # mV; int() skips \r
+                        except ValueError:
+                            logging.warning(f"Error parsing voltage line {bytes(buf[start:end])!r}")
+                    start = end + 1
+                
+                # Keep only the trailing partial line for the next call
+                del buf[:start]
+                if len(buf) > MAX_PARTIAL_LINE:
+                    buf.clear()
                 
-                # Skip empty lines and null characters
-                if not line or line == '\x00' or len(line) < 2:
-                    continue
+                if voltage is not None:
+                    self.last_voltage = voltage
+                    
+                    # Track successful read
+                    read_time = time.time()
+                    self.last_successful_voltage_read = read_time
+                    self.consecutive_read_failures = 0
                     
-                if line.startswith("V"):
-                    try:
-                        parts = line.split("\t")
-                        if len(parts) >= 2:
-                            mv = int(parts[1])
-                            voltage = mv / 1000.0
-                            self.last_voltage = voltage
-                            
-                            # Track successful read
-                            self.last_successful_voltage_read = time.time()
-                            self.consecutive_read_failures = 0
-                            
-                            # Add to history for solar detection
-                            self.voltage_history.append((time.time(), voltage))
-                            
-                            return voltage
-                    except (ValueError, IndexError) as e:
-                        logging.warning(f"Error parsing voltage line '{line}': {e}")
-                        continue
+                    # Add to history for solar detection
+                    self.history_times.append(read_time)
+                    self.history_voltages.append(voltage)
+                    # Keep the history to SOLAR_DETECTION_WINDOW seconds - while the interval
+                    # is backed off, maxlen readings would span several times that
+                    cutoff = read_time - SOLAR_DETECTION_WINDOW
+                    while self.history_times[0] < cutoff:
+                        self.history_times.popleft()
+                        self.history_voltages.popleft()
+                    
+                    return voltage
+                if time.monotonic() >= deadline:
+                    break
                         
-            logging.warning("No voltage reading received after 50 attempts")
+            logging.warning(f"No voltage reading received within {READ_TIMEOUT}s")
             self.consecutive_read_failures += 1
             return None
             
@@ -239,13 +562,8 @@ class SmartBatteryMonitor:
                     pass
                 
                 try:
-                    # Try to find and reconnect to USB device
-                    new_port = self.find_usb_device()
-                    if new_port != self.serial_port:
-                        logging.info(f"USB device changed from {self.serial_port} to {new_port}")
-                        self.serial_port = new_port
-                    
-                    self.ser = serial.Serial(self.serial_port, baudrate=BAUD_RATE, timeout=2)
+                    # Reopen the same port if it came back, else scan for the device
+                    self.connect_serial()
                     logging.info(f"Successfully reconnected to {self.serial_port}")
                     
                     # Try reading voltage again after reconnection (mark as recovery attempt)
@@ -264,46 +582,39 @@ class SmartBatteryMonitor:
             return False
         
         # If we don't have enough voltage history yet, use time-based detection as fallback
-        if len(self.voltage_history) < 5:
+        if len(self.history_voltages) < 5:
             time_result = self._detect_solar_by_time()
             if time_result:
                 self.solar_detected = time_result
             return time_result
             
         try:
-            solar_indicators = []
+            # One pass over the history shared by every method below
+            features = self._solar_features()
             detection_reasons = []
             
             # Method 1: Voltage Trend Analysis (original method)
             if SOLAR_DETECTION_METHODS.get('voltage_trend', True):
-                trend_result = self._detect_solar_by_voltage_trend()
-                solar_indicators.append(trend_result)
-                if trend_result:
+                if self._detect_solar_by_voltage_trend(features):
                     detection_reasons.append("voltage_trend")
             
             # Method 2: Time-based Detection (daylight hours)
             if SOLAR_DETECTION_METHODS.get('time_based', True):
-                time_result = self._detect_solar_by_time()
-                solar_indicators.append(time_result)
-                if time_result:
+                if features.is_daylight:
                     detection_reasons.append("daylight_hours")
             
             # Method 3: Voltage Plateau Detection (high voltage sustained)
             if SOLAR_DETECTION_METHODS.get('voltage_plateau', True):
-                plateau_result = self._detect_solar_by_plateau()
-                solar_indicators.append(plateau_result)
-                if plateau_result:
+                if self._detect_solar_by_plateau(features):
                     detection_reasons.append("voltage_plateau")
             
             # Method 4: Load-Compensated Detection
             if SOLAR_DETECTION_METHODS.get('load_compensation', True):
-                load_result = self._detect_solar_with_load_compensation()
-                solar_indicators.append(load_result)
-                if load_result:
+                if self._detect_solar_with_load_compensation(features):
                     detection_reasons.append("load_compensated")
             
             # Solar is active if ANY method detects it (OR logic)
-            solar_active = any(solar_indicators)
+            solar_active = bool(detection_reasons)
             
             # Log status changes with detection method
             if solar_active != self.solar_detected:
@@ -319,86 +630,86 @@ class SmartBatteryMonitor:
             
         return False
         
-    def _detect_solar_by_voltage_trend(self):
+    def _recent_voltage_rate(self, count):
+        """Voltage change rate (V/hour) across the last `count` readings, None if no time elapsed"""
+        oldest = -min(count, len(self.history_times))
+        time_diff = self.history_times[-1] - self.history_times[oldest]
+        if time_diff <= 0:
+            return None
+        voltage_diff = self.history_voltages[-1] - self.history_voltages[oldest]
+        return voltage_diff / (time_diff / 3600)
+    
+    def _solar_features(self):
+        """Inputs of all solar detectors, computed once per monitor cycle"""
+        # Same cycle and same history -> same features (solar detection, load
+        # estimate, should_charge and the status log all ask within one cycle)
+        key = (self.tick_now, len(self.history_times),
+               self.history_times[-1] if self.history_times else None)
+        if self.tick_now is not None and self.solar_features_cache[0] == key:
+            return self.solar_features_cache[1]
+        
+        features = self._compute_solar_features()
+        self.solar_features_cache = (key, features)
+        return features
+    
+    def _compute_solar_features(self):
+        """Compute the inputs of all solar detectors from the current voltage history"""
+        n_samples = len(self.history_voltages)
+        if n_samples == 0:
+            return SolarFeatures(0, self.last_voltage, None, None, 0, self._detect_solar_by_time())
+        
+        # Plateau: span of the readings at or above the plateau threshold
+        # (only the first and last such reading matter - scan in from both ends, no list)
+        plateau_duration = 0
+        if self.last_voltage >= SOLAR_PLATEAU_THRESHOLD:
+            first = next((t for t, v in zip(self.history_times, self.history_voltages)
+                          if v >= SOLAR_PLATEAU_THRESHOLD), None)
+            if first is not None:
+                last = next(t for t, v in zip(reversed(self.history_times), reversed(self.history_voltages))
+                            if v >= SOLAR_PLATEAU_THRESHOLD)
+                plateau_duration = last - first
+        
+        return SolarFeatures(
+            n_samples=n_samples,
+            last_voltage=self.last_voltage,
+            trend_rate=self._recent_voltage_rate(10),
+            load_rate=self._recent_voltage_rate(20),
+            plateau_duration=plateau_duration,
+            is_daylight=self._detect_solar_by_time(),
+        )
+        
+    def _detect_solar_by_voltage_trend(self, features):
         """Detect solar by rising voltage trend during daylight hours"""
-        recent_readings = list(self.voltage_history)[-10:]
-        if len(recent_readings) < 5:
+        if features.n_samples < 5 or features.trend_rate is None:
             return False
-            
-        times = [reading[0] for reading in recent_readings]
-        voltages = [reading[1] for reading in recent_readings]
         
-        time_diff = times[-1] - times[0]
-        voltage_diff = voltages[-1] - voltages[0]
-        
-        if time_diff > 0:
-            voltage_rate = voltage_diff / (time_diff / 3600)
-            is_daylight = self._detect_solar_by_time()
-            
-            # Solar detected if voltage is rising during daylight hours
-            # (regardless of absolute voltage level)
-            return (voltage_rate > SOLAR_VOLTAGE_INCREASE_RATE and is_daylight)
-        return False
+        # Solar detected if voltage is rising during daylight hours
+        # (regardless of absolute voltage level)
+        return (features.trend_rate > SOLAR_VOLTAGE_INCREASE_RATE and features.is_daylight)
         
     def _detect_solar_by_time(self):
         """Time-based solar detection using monthly daylight hours"""
-        now = datetime.now()
-        current_hour = now.hour
-        
-        # Get precise daylight hours for current month
-        start_hour, end_hour = self.get_monthly_daylight_hours()
-        is_daylight = start_hour <= current_hour < end_hour
+        now = self.current_datetime()
+        # Daylight window for the month, narrowed in deep winter (see config.solar_hours_mask)
+        return bool((SOLAR_HOURS_MASK_BY_MONTH[now.month] >> now.hour) & 1)
         
-        # Apply solar factor for more accurate detection
-        solar_factor = self.get_solar_factor()
-        
-        # In very low solar months (Dec/Jan), be more conservative
-        if solar_factor < 0.3:
-            # Require more restrictive daylight hours in deep winter
-            peak_hours = (start_hour + 2, end_hour - 2)
-            if peak_hours[0] < peak_hours[1]:  # Valid range
-                is_peak_daylight = peak_hours[0] <= current_hour < peak_hours[1]
-                return is_daylight and is_peak_daylight
-        
-        return is_daylight
-        
-    def _detect_solar_by_plateau(self):
+    def _detect_solar_by_plateau(self, features):
         """Detect solar by sustained high voltage (even with load)"""
-        if self.last_voltage < SOLAR_PLATEAU_THRESHOLD:
-            return False
-            
-        # Check if voltage has been high for minimum duration
-        recent_readings = list(self.voltage_history)
-        plateau_readings = [r for r in recent_readings 
-                          if r[1] >= SOLAR_PLATEAU_THRESHOLD]
-        
-        if len(plateau_readings) < 2:
+        if features.last_voltage < SOLAR_PLATEAU_THRESHOLD:
             return False
-            
-        # Check duration of plateau
-        plateau_duration = plateau_readings[-1][0] - plateau_readings[0][0]
-        is_daylight = self._detect_solar_by_time()
         
-        return (plateau_duration >= SOLAR_PLATEAU_MIN_DURATION and 
-                is_daylight)
+        # Check if voltage has been high for minimum duration
+        return (features.plateau_duration >= SOLAR_PLATEAU_MIN_DURATION and 
+                features.is_daylight)
         
-    def _detect_solar_with_load_compensation(self):
+    def _detect_solar_with_load_compensation(self, features):
         """Enhanced load-compensated solar detection using system specs"""
-        if len(self.voltage_history) < 20:  # Need more history
+        if features.n_samples < 20:  # Need more history
             return False
             
-        recent_readings = list(self.voltage_history)[-20:]  # Last 10 minutes
-        times = [r[0] for r in recent_readings]
-        voltages = [r[1] for r in recent_readings]
-        
-        time_diff = times[-1] - times[0]
-        voltage_diff = voltages[-1] - voltages[0]
-        
-        if time_diff > 0:
-            voltage_rate = voltage_diff / (time_diff / 3600)  # V/hour
-            is_daylight = self._detect_solar_by_time()
-            
-            if not is_daylight:
+        voltage_rate = features.load_rate  # V/hour over the last 20 readings
+        if voltage_rate is not None:
+            if not features.is_daylight:
                 return False
                 
             # Determine expected voltage drop based on system load patterns
@@ -429,23 +740,18 @@ class SmartBatteryMonitor:
         
         return False
         
-    def _estimate_current_load_level(self):
+    def _estimate_current_load_level(self, features=None):
         """Estimate current system load based on voltage drop rate"""
-        if len(self.voltage_history) < 10:
+        if len(self.history_voltages) < 10:
             return "unknown"
+        if features is None:
+            features = self._solar_features()
             
-        recent_readings = list(self.voltage_history)[-10:]
-        times = [r[0] for r in recent_readings]
-        voltages = [r[1] for r in recent_readings]
-        
-        time_diff = times[-1] - times[0]
-        voltage_diff = voltages[-1] - voltages[0]
-        
-        if time_diff > 0:
-            voltage_rate = voltage_diff / (time_diff / 3600)
+        voltage_rate = features.trend_rate
+        if voltage_rate is not None:
             
             # During non-solar hours, voltage drop rate indicates load
-            if not self._detect_solar_by_time():
+            if not features.is_daylight:
                 if voltage_rate <= -HEAVY_LOAD_VOLTAGE_DROP:
                     return "heavy"  # >1kW load
                 elif voltage_rate <= -TYPICAL_NIGHTTIME_VOLTAGE_DROP:
@@ -457,135 +763,82 @@ class SmartBatteryMonitor:
                     
         return "unknown"
         
-    def is_weekend_or_holiday(self):
-        """Check if current day is weekend (rates are different)"""
-        return datetime.now().weekday() >= 5  # Saturday = 5, Sunday = 6
+    def parse_holidays(self):
+        """Parse HOLIDAYS into a frozenset of dates"""
+        holidays = set()
+        for day in HOLIDAYS:
+            try:
+                holidays.add(datetime.strptime(day, "%Y-%m-%d").date())
+            except ValueError as e:
+                logging.warning(f"Invalid holiday date format: {day} - {e}")
+        return frozenset(holidays)
+    
+    def is_weekend_or_holiday(self, now=None):
+        """Check if current day is weekend or holiday (rates are different)"""
+        if now is None:
+            now = self.current_datetime()
+        day = now.date()
+        if self.day_type_cache[0] != day:
+            self.day_type_cache = (day, day.weekday() >= 5 or day in self.holidays)  # Saturday = 5, Sunday = 6
+        return self.day_type_cache[1]
         
     def get_current_season(self):
         """Determine if we're in summer or winter rate period (for utility billing)"""
-        current_month = datetime.now().month
-        if 6 <= current_month <= 9:  # June-September
-            return 'summer'
-        else:  # October-May
-            return 'winter'
+        return UTILITY_SEASON_BY_MONTH[self.current_datetime().month]
     
     def get_current_month_profile(self):
         """Get detailed monthly solar profile for current month"""
-        current_month = datetime.now().month
-        return MONTHLY_SOLAR_PROFILE.get(current_month, MONTHLY_SOLAR_PROFILE[1])
+        return MONTHLY_SOLAR_PROFILE[self.current_datetime().month]
     
     def get_monthly_season_name(self):
         """Get descriptive seasonal name based on current month"""
-        return self.get_current_month_profile()['name']
+        return SEASON_NAME_BY_MONTH[self.current_datetime().month]
     
     def get_solar_factor(self):
         """Get solar generation factor for current month (0.0 to 1.0)"""
-        return self.get_current_month_profile()['solar_factor']
+        return SOLAR_FACTOR_BY_MONTH[self.current_datetime().month]
     
     def get_monthly_daylight_hours(self):
         """Get daylight hours for current month"""
-        return self.get_current_month_profile()['daylight']
+        return DAYLIGHT_BY_MONTH[self.current_datetime().month]
+            
+    def current_datetime(self):
+        """Wall-clock time of the current monitor cycle (datetime.now() outside the loop)"""
+        return self.tick_now or datetime.now()
+        
+    def current_timestamp(self):
+        """current_datetime() as a Unix timestamp (time.time() outside the loop)"""
+        return self.tick_ts if self.tick_now else time.time()
+        
+    def _clock_key(self):
+        """(hour, is_weekend, month) for now - the inputs of every time-of-day lookup"""
+        # Worked out once per monitor cycle: the CSV row, rate logging and
+        # should_charge all ask for it
+        if self.tick_now is not None and self.clock_key_cache[0] == self.tick_now:
+            return self.clock_key_cache[1]
+        now = self.current_datetime()
+        key = (now.hour, self.is_weekend_or_holiday(now), now.month)
+        if self.tick_now is not None:
+            self.clock_key_cache = (self.tick_now, key)
+        return key
             
     def get_current_rate_info(self):
         """Get current electricity rate information based on your TOD schedule"""
-        now = datetime.now()
-        current_hour = now.hour
-        is_weekend = self.is_weekend_or_holiday()
-        season = self.get_current_season()
-        
-        # EV credit applies midnight-6AM every day
-        has_ev_credit = 0 <= current_hour < 6
-        
-        if is_weekend:
-            # Weekends and holidays are all off-peak
-            rate_type = "off_peak_weekend"
-            rate = RATE_INFO[season]['off_peak']
-        else:
-            # Weekday rates based on your TOD schedule
-            if season == 'summer':
-                if 0 <= current_hour < 12:  # Midnight-noon
-                    rate_type = "off_peak"
-                    rate = RATE_INFO[season]['off_peak']
-                elif 12 <= current_hour < 17:  # Noon-5PM
-                    rate_type = "mid_peak"
-                    rate = RATE_INFO[season]['mid_peak']
-                elif 17 <= current_hour < 20:  # 5PM-8PM (PEAK - most expensive!)
-                    rate_type = "peak"
-                    rate = RATE_INFO[season]['peak']
-                else:  # 8PM-midnight
-                    rate_type = "off_peak"
-                    rate = RATE_INFO[season]['off_peak']
-            else:  # winter
-                if 17 <= current_hour < 20:  # 5PM-8PM (PEAK)
-                    rate_type = "peak"
-                    rate = RATE_INFO[season]['peak']
-                else:  # All other hours are off-peak in winter
-                    rate_type = "off_peak"
-                    rate = RATE_INFO[season]['off_peak']
-        
-        # Apply EV credit if applicable (negative cost!)
-        if has_ev_credit:
-            rate += RATE_INFO[season]['ev_credit']  # EV credit is negative
-            rate_type += "_with_ev_credit"
-            
-        return rate_type, rate, has_ev_credit
+        return rate_info_for(*self._clock_key())
         
     def is_preferred_charging_time(self):
         """Check if current time is in preferred charging hours"""
-        current_hour = datetime.now().hour
-        is_weekend = self.is_weekend_or_holiday()
-        
-        # Weekends have off-peak rates all day, but still use strategic timing
-        # Only treat EV credit hours as truly "preferred" on weekends
-        if is_weekend:
-            # EV credit hours are preferred even on weekends (cheapest rates)
-            if 0 <= current_hour < 6:
-                return True
-            # Other weekend hours are "acceptable" but not "preferred"
-            return False
-            
-        # Check preferred hours for weekdays
-        for start_hour, end_hour in PREFERRED_CHARGING_HOURS:
-            if start_hour <= end_hour:
-                # Same day range
-                if start_hour <= current_hour < end_hour:
-                    return True
-            else:
-                # Overnight range (crosses midnight)
-                if current_hour >= start_hour or current_hour < end_hour:
-                    return True
-                    
-        return False
+        hour, is_weekend, _ = self._clock_key()
+        return is_preferred_hour(hour, is_weekend)
         
     def is_avoid_charging_time(self):
         """Check if current time is in avoid charging hours (peak rates)"""
-        current_hour = datetime.now().hour
-        is_weekend = self.is_weekend_or_holiday()
-        
-        # Weekends never have peak rates
-        if is_weekend:
-            return False
-            
-        # Check avoid hours for weekdays only (5PM-8PM peak rates)
-        for start_hour, end_hour in AVOID_CHARGING_HOURS:
-            if start_hour <= end_hour:
-                if start_hour <= current_hour < end_hour:
-                    return True
-            else:
-                if current_hour >= start_hour or current_hour < end_hour:
-                    return True
-                    
-        return False
+        hour, is_weekend, _ = self._clock_key()
+        return is_avoid_hour(hour, is_weekend)
     
-    def is_camping_period(self):
-        """Check if current date falls within any camping period"""
-        from datetime import datetime, date
-        
-        if not CAMPING_PERIODS:
-            return False, None
-            
-        today = date.today()
-        
+    def parse_camping_periods(self):
+        """Parse CAMPING_PERIODS into (start_date, end_date, voltage_threshold) tuples"""
+        periods = []
         for period in CAMPING_PERIODS:
             if len(period) == 3:
                 start_str, end_str, voltage_threshold = period
@@ -597,12 +850,19 @@ class SmartBatteryMonitor:
             try:
                 start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
                 end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
-                
-                if start_date <= today <= end_date:
-                    return True, voltage_threshold
+                periods.append((start_date, end_date, voltage_threshold))
             except ValueError as e:
                 logging.warning(f"Invalid camping period date format: {period} - {e}")
-                continue
+        return periods
+    
+    def is_camping_period(self):
+        """Check if current date falls within any camping period"""
+        today = self.current_datetime().date()
+        
+        # Config order decides between overlapping periods
+        for start_date, end_date, voltage_threshold in self.camping_periods:
+            if start_date <= today <= end_date:
+                return True, voltage_threshold
         
         return False, None
     
@@ -624,7 +884,8 @@ class SmartBatteryMonitor:
         # Schedule reboot immediately (now instead of +1 minute)
         try:
             logging.info("⏰ Executing system reboot NOW...")
-            # Flush all logs before reboot
+            # Flush buffered CSV rows and all logs before reboot
+            self.flush_csv()
             for handler in logging.getLogger().handlers:
                 handler.flush()
             
@@ -640,23 +901,60 @@ class SmartBatteryMonitor:
             # Continue running if reboot fails
             return
     
-    def reset_inverter_if_needed(self):
-        """Reset inverter once per day at scheduled time to prevent failures"""
+    def schedule_inverter_reset(self, min_delay=0):
+        """Arm a timer for the next daily inverter reset instead of checking every cycle"""
         if not INVERTER_RESET_ENABLED:
             return
         
         now = datetime.now()
-        current_date = now.date()
+        next_reset = now.replace(hour=INVERTER_RESET_HOUR, minute=INVERTER_RESET_MINUTE,
+                                 second=0, microsecond=0)
+        # Still inside today's 5 minute window (e.g. just restarted) -> reset right away
+        if now >= next_reset + timedelta(minutes=5) or self.last_inverter_reset_date == now.date():
+            next_reset += timedelta(days=1)
+        # Timers run on the monotonic clock - wake up at least hourly so an NTP
+        # jump of the wall clock moves the reset with it
+        delay = min(max(min_delay, (next_reset - now).total_seconds()), INVERTER_RESET_RECHECK)
+        
+        self.inverter_reset_timer = threading.Timer(delay, self.inverter_reset_timer_fired)
+        self.inverter_reset_timer.daemon = True
+        self.inverter_reset_timer.start()
+        next_reset = max(now, next_reset)
+        if next_reset != self.next_inverter_reset:
+            self.next_inverter_reset = next_reset
+            logging.info(f"🔄 Next inverter reset scheduled for {next_reset.strftime('%Y-%m-%d %H:%M')}")
+    
+    def inverter_reset_timer_fired(self):
+        """Timer callback: flag the reset if the wall clock is in today's reset window, otherwise re-arm"""
+        now = datetime.now()
+        window_start = now.replace(hour=INVERTER_RESET_HOUR, minute=INVERTER_RESET_MINUTE,
+                                   second=0, microsecond=0)
+        if (window_start <= now < window_start + timedelta(minutes=5)
+                and self.last_inverter_reset_date != now.date()):
+            # GPIO is only driven from the main loop, never from this thread
+            self.inverter_reset_due.set()
+        else:
+            self.schedule_inverter_reset()
+    
+    def reset_inverter_if_due(self):
+        """Run a reset the timer flagged (main loop), then arm the timer again"""
+        if not self.inverter_reset_due.is_set():
+            return
+        self.inverter_reset_due.clear()
         
-        # Check if we're in the reset time window and haven't reset today
-        if (now.hour == INVERTER_RESET_HOUR and 
-            now.minute >= INVERTER_RESET_MINUTE and 
-            now.minute < INVERTER_RESET_MINUTE + 5 and
-            self.last_inverter_reset_date != current_date):
-            
-            current_time = now.strftime("%Y-%m-%d %H:%M:%S")
-            logging.info(f"🔄 INVERTER RESET: Daily maintenance reset at {current_time}")
-            
+        if self.reset_inverter():
+            self.last_inverter_reset_date = date.today()
+            self.schedule_inverter_reset()
+        else:
+            # The day isn't marked done - retry a cycle later while the window lasts
+            self.schedule_inverter_reset(min_delay=MONITOR_INTERVAL)
+    
+    def reset_inverter(self):
+        """Reset inverter once per day at scheduled time to prevent failures; True if it worked"""
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        logging.info(f"🔄 INVERTER RESET: Daily maintenance reset at {current_time}")
+        
+        with self.inverter_lock:
             try:
                 # Turn inverter OFF (GPIO.HIGH)
                 logging.info(f"⚡ Turning inverter OFF for {INVERTER_RESET_DURATION} seconds...")
@@ -666,9 +964,7 @@ class SmartBatteryMonitor:
                 # Turn inverter back ON (GPIO.LOW)
                 GPIO.output(INVERTER_PIN, GPIO.LOW)
                 logging.info("✅ Inverter reset complete - inverter is now ON")
-                
-                # Mark that we've reset today
-                self.last_inverter_reset_date = current_date
+                return True
                 
             except Exception as e:
                 logging.error(f"❌ Failed to reset inverter: {e}")
@@ -677,60 +973,52 @@ class SmartBatteryMonitor:
                     GPIO.output(INVERTER_PIN, GPIO.LOW)
                 except:
                     pass
+                return False
     
     def check_charging_failure(self, voltage):
         """Detect if charger is connected but not actually charging during EV credit hours"""
         if not CHARGING_FAILURE_DETECTION_ENABLED:
             return
         
-        now = datetime.now()
+        now = self.current_datetime()
         current_hour = now.hour
         
         # Only check during EV credit hours (midnight-6AM)
         if not (0 <= current_hour < 6):
             # Reset tracking when outside EV hours
-            self.ev_charging_start_time = None
-            self.ev_charging_start_voltage = None
+            self.ev_charging_tracker.reset()
             return
         
         # Only check if voltage is below threshold (not already full)
         if voltage >= CHARGING_FAILURE_MAX_VOLTAGE:
-            self.ev_charging_start_time = None
-            self.ev_charging_start_voltage = None
+            self.ev_charging_tracker.reset()
             return
         
         # Only check if charger is supposed to be connected
         if not self.charger_connected:
-            self.ev_charging_start_time = None
-            self.ev_charging_start_voltage = None
+            self.ev_charging_tracker.reset()
             return
         
         # Start tracking if this is the first check during charging
-        if self.ev_charging_start_time is None:
-            self.ev_charging_start_time = time.time()
-            self.ev_charging_start_voltage = voltage
+        if self.ev_charging_tracker.start_time is None:
+            self.ev_charging_tracker.start(self.current_timestamp(), voltage)
             logging.info(f"🔋 Started tracking EV charging: {voltage:.2f}V at {now.strftime('%H:%M')}")
             return
         
-        # Check if enough time has passed
-        elapsed_minutes = (time.time() - self.ev_charging_start_time) / 60
-        if elapsed_minutes < CHARGING_FAILURE_CHECK_MINUTES:
+        # Check if enough time has passed, and by how much the voltage rose
+        rise = self.ev_charging_tracker.rise(self.current_timestamp(), voltage)
+        if rise is None:
             return
-        
-        # Calculate voltage increase
-        voltage_increase = voltage - self.ev_charging_start_voltage
+        elapsed_minutes, voltage_increase = rise
         
         # Check if voltage increased enough
         if voltage_increase < CHARGING_FAILURE_MIN_VOLTAGE_INCREASE:
             # Charging failure detected!
-            cooldown_period = timedelta(hours=1)
-            
             # Only alert once per hour to avoid spam
-            if (self.last_charging_failure_alert is None or 
-                now - self.last_charging_failure_alert > cooldown_period):
+            if self.alert_due('charging_failure', cooldown=3600):
                 
                 logging.warning(f"⚠️ CHARGING FAILURE DETECTED!")
-                logging.warning(f"   Start: {self.ev_charging_start_voltage:.2f}V at {datetime.fromtimestamp(self.ev_charging_start_time).strftime('%H:%M')}")
+                logging.warning(f"   Start: {self.ev_charging_tracker.start_voltage:.2f}V at {datetime.fromtimestamp(self.ev_charging_tracker.start_time).strftime('%H:%M')}")
                 logging.warning(f"   Now:   {voltage:.2f}V at {now.strftime('%H:%M')}")
                 logging.warning(f"   Increase: {voltage_increase:.2f}V over {elapsed_minutes:.0f} minutes")
                 logging.warning(f"   Expected: >{CHARGING_FAILURE_MIN_VOLTAGE_INCREASE}V")
@@ -743,9 +1031,9 @@ CHARGING FAILURE DETECTED!
 Your battery charger appears to be connected but NOT actually charging during the EV credit period (midnight-6AM).
 
 Charging Session Details:
-- Started: {datetime.fromtimestamp(self.ev_charging_start_time).strftime('%Y-%m-%d %H:%M:%S')}
+- Started: {datetime.fromtimestamp(self.ev_charging_tracker.start_time).strftime('%Y-%m-%d %H:%M:%S')}
 - Duration: {elapsed_minutes:.0f} minutes
-- Starting Voltage: {self.ev_charging_start_voltage:.2f}V
+- Starting Voltage: {self.ev_charging_tracker.start_voltage:.2f}V
 - Current Voltage: {voltage:.2f}V
 - Voltage Increase: {voltage_increase:.2f}V
 - Expected Increase: >{CHARGING_FAILURE_MIN_VOLTAGE_INCREASE}V
@@ -775,68 +1063,62 @@ Recommended Actions:
 This is valuable EV credit time being wasted - please investigate immediately!
                 """
                 
-                self.send_email_notification(subject, message, is_critical=True)
-                self.last_charging_failure_alert = now
+                self.send_alert('charging_failure', subject, message, is_critical=True)
                 
                 # Attempt recovery by resetting inverter
                 logging.info("🔄 Attempting recovery: Resetting inverter...")
                 try:
-                    GPIO.output(INVERTER_PIN, GPIO.HIGH)
-                    time.sleep(INVERTER_RESET_DURATION)
-                    GPIO.output(INVERTER_PIN, GPIO.LOW)
+                    with self.inverter_lock:
+                        GPIO.output(INVERTER_PIN, GPIO.HIGH)
+                        time.sleep(INVERTER_RESET_DURATION)
+                        GPIO.output(INVERTER_PIN, GPIO.LOW)
                     logging.info("✅ Inverter reset complete")
                 except Exception as e:
                     logging.error(f"❌ Inverter reset failed: {e}")
             
             # Reset tracking to check again in next cycle
-            self.ev_charging_start_time = None
-            self.ev_charging_start_voltage = None
+            self.ev_charging_tracker.reset()
         else:
             # Charging is working - log success and reset tracking for next check
             logging.info(f"✅ EV charging verified: {voltage_increase:.2f}V increase over {elapsed_minutes:.0f} minutes")
-            self.ev_charging_start_time = None
-            self.ev_charging_start_voltage = None
+            self.ev_charging_tracker.reset()
     
     def detect_voltage_stall(self, voltage):
         """Detect if voltage isn't increasing while charger is connected (anytime)"""
         if not VOLTAGE_STALL_DETECTION_ENABLED:
             return
         
-        now = datetime.now()
+        now = self.current_datetime()
         
         # Only check when charger is connected and voltage is below threshold
         if not self.charger_connected or voltage >= VOLTAGE_STALL_MAX_VOLTAGE:
             # Reset tracking when charger disconnected or battery nearly full
-            self.voltage_stall_start_time = None
-            self.voltage_stall_start_voltage = None
+            self.voltage_stall_tracker.reset()
             return
         
         # Start tracking if this is the first check during charging
-        if self.voltage_stall_start_time is None:
-            self.voltage_stall_start_time = time.time()
-            self.voltage_stall_start_voltage = voltage
-            logging.debug(f"📊 Started voltage stall tracking: {voltage:.2f}V")
+        if self.voltage_stall_tracker.start_time is None:
+            self.voltage_stall_tracker.start(self.current_timestamp(), voltage)
+            logging.debug("📊 Started voltage stall tracking: %.2fV", voltage)
             return
         
-        # Check if enough time has passed
-        elapsed_minutes = (time.time() - self.voltage_stall_start_time) / 60
-        if elapsed_minutes < VOLTAGE_STALL_CHECK_MINUTES:
+        # Check if enough time has passed, and by how much the voltage rose
+        rise = self.voltage_stall_tracker.rise(self.current_timestamp(), voltage)
+        if rise is None:
             return
-        
-        # Calculate voltage increase
-        voltage_increase = voltage - self.voltage_stall_start_voltage
+        elapsed_minutes, voltage_increase = rise
         
         # Check if voltage increased enough
         if voltage_increase < VOLTAGE_STALL_MIN_INCREASE:
             # Voltage stall detected!
-            cooldown_period = timedelta(hours=VOLTAGE_STALL_COOLDOWN_HOURS)
-            
+            # A charging failure alert in the last hour already reported this same condition
+            if self.alert_sent_within('charging_failure', 3600):
+                logging.info(f"Voltage stall at {voltage:.2f}V already covered by the charging failure alert")
             # Only alert once per cooldown period to avoid spam
-            if (self.last_voltage_stall_alert is None or 
-                now - self.last_voltage_stall_alert > cooldown_period):
+            elif self.alert_due('voltage_stall', cooldown=VOLTAGE_STALL_COOLDOWN_HOURS * 3600):
                 
                 logging.warning(f"⚠️ VOLTAGE STALL DETECTED!")
-                logging.warning(f"   Start: {self.voltage_stall_start_voltage:.2f}V at {datetime.fromtimestamp(self.voltage_stall_start_time).strftime('%H:%M')}")
+                logging.warning(f"   Start: {self.voltage_stall_tracker.start_voltage:.2f}V at {datetime.fromtimestamp(self.voltage_stall_tracker.start_time).strftime('%H:%M')}")
                 logging.warning(f"   Now:   {voltage:.2f}V at {now.strftime('%H:%M')}")
                 logging.warning(f"   Increase: {voltage_increase:.2f}V over {elapsed_minutes:.0f} minutes")
                 logging.warning(f"   Expected: >{VOLTAGE_STALL_MIN_INCREASE}V")
@@ -849,9 +1131,9 @@ VOLTAGE STALL DETECTED
 Your battery charger is connected but voltage has not increased for {elapsed_minutes:.0f} minutes.
 
 Details:
-- Started Tracking: {datetime.fromtimestamp(self.voltage_stall_start_time).strftime('%Y-%m-%d %H:%M:%S')}
+- Started Tracking: {datetime.fromtimestamp(self.voltage_stall_tracker.start_time).strftime('%Y-%m-%d %H:%M:%S')}
 - Duration: {elapsed_minutes:.0f} minutes
-- Starting Voltage: {self.voltage_stall_start_voltage:.2f}V
+- Starting Voltage: {self.voltage_stall_tracker.start_voltage:.2f}V
 - Current Voltage: {voltage:.2f}V
 - Voltage Change: {voltage_increase:+.2f}V
 - Expected Increase: >{VOLTAGE_STALL_MIN_INCREASE}V
@@ -875,39 +1157,62 @@ You may want to:
 This notification will not repeat for {VOLTAGE_STALL_COOLDOWN_HOURS} hours.
                 """
                 
-                self.send_email_notification(subject, message, is_critical=False)
-                self.last_voltage_stall_alert = now
+                self.send_alert('voltage_stall', subject, message)
             
             # Reset tracking to check again in next cycle
-            self.voltage_stall_start_time = None
-            self.voltage_stall_start_voltage = None
+            self.voltage_stall_tracker.reset()
         else:
             # Charging is working - reset tracking for next check
-            logging.debug(f"✅ Charging verified: {voltage_increase:.2f}V increase over {elapsed_minutes:.0f} minutes")
-            self.voltage_stall_start_time = None
-            self.voltage_stall_start_voltage = None
+            logging.debug("✅ Charging verified: %.2fV increase over %.0f minutes", voltage_increase, elapsed_minutes)
+            self.voltage_stall_tracker.reset()
     
     def check_internet_connectivity(self):
-        """Check if Pi can communicate with the internet"""
+        """Check if Pi can communicate with the internet (all hosts probed at once)"""
         import socket
+        import errno
         
-        for host in INTERNET_CHECK_HOSTS:
-            try:
-                # Try to connect to the host on port 53 (DNS)
-                socket.setdefaulttimeout(INTERNET_CHECK_TIMEOUT)
-                socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, 53))
-                return True
-            except (socket.error, socket.timeout):
-                continue
-        
-        return False
+        # Non-blocking TCP connects to port 53 (DNS) on every host; the first to
+        # complete wins, so an outage costs one timeout instead of one per host
+        pending = []     # Every socket opened (closed on the way out)
+        connecting = []  # Those with a connect still in progress
+        try:
+            for host in INTERNET_CHECK_HOSTS:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                pending.append(sock)
+                sock.setblocking(False)
+                try:
+                    result = sock.connect_ex((host, 53))
+                except OSError:
+                    continue  # e.g. unresolvable host name - try the others
+                if result == 0:
+                    return True
+                if result in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    connecting.append(sock)
+            
+            deadline = time.monotonic() + INTERNET_CHECK_TIMEOUT
+            while connecting:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _, connected, _ = select.select([], connecting, [], remaining)
+                if not connected:
+                    break
+                for sock in connected:
+                    # Writable means the connect finished - SO_ERROR says whether it worked
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        return True
+                    connecting.remove(sock)
+            return False
+        finally:
+            for sock in pending:
+                sock.close()
     
     def check_internet_health(self):
         """Monitor internet connectivity and reset Pi if connection is lost"""
         if not INTERNET_HEALTH_CHECK_ENABLED:
             return
         
-        now = time.time()
+        now = self.current_timestamp()
         
         # Only check at specified intervals
         if now - self.last_internet_check < INTERNET_CHECK_INTERVAL:
@@ -923,7 +1228,7 @@ This notification will not repeat for {VOLTAGE_STALL_COOLDOWN_HOURS} hours.
             if self.consecutive_internet_failures > 0:
                 logging.info(f"✅ Internet connectivity restored after {self.consecutive_internet_failures} failures")
                 self.consecutive_internet_failures = 0
-                self.last_internet_failure_alert = None
+                self.clear_alert('internet_failure')
         else:
             # Connection failed
             self.consecutive_internet_failures += 1
@@ -931,12 +1236,10 @@ This notification will not repeat for {VOLTAGE_STALL_COOLDOWN_HOURS} hours.
             
             # Send alert on first failure
             if self.consecutive_internet_failures == 1:
-                current_time = datetime.now()
-                cooldown_period = timedelta(hours=1)
+                current_time = self.current_datetime()
                 
                 # Only alert once per hour to avoid spam
-                if (self.last_internet_failure_alert is None or 
-                    current_time - self.last_internet_failure_alert > cooldown_period):
+                if self.alert_due('internet_failure', cooldown=3600):
                     
                     subject = "⚠️ Internet Connectivity Issue - RV Battery Monitor"
                     message = f"""
@@ -963,8 +1266,7 @@ Battery Status:
 The system is still monitoring battery voltage and controlling the charger normally.
                     """
                     
-                    self.send_email_notification(subject, message)
-                    self.last_internet_failure_alert = current_time
+                    self.send_alert('internet_failure', subject, message)
             
             # Check if we've reached the threshold for reset
             if self.consecutive_internet_failures >= INTERNET_FAILURE_THRESHOLD:
@@ -1014,14 +1316,19 @@ The battery monitoring system will resume automatically after reboot.
 If you continue to receive these alerts, there may be a persistent network issue that requires manual intervention.
             """
             
-            self.send_email_notification(subject, message, is_critical=True)
+            self.queue_email(subject, message, is_critical=True)
         except Exception as e:
             logging.error(f"Failed to send reset notification email: {e}")
         
+        # Give queued emails (this one included) a chance to go out first
+        if not self.flush_emails(timeout=60):
+            logging.warning("Emails still queued at reboot - they will be lost")
+        
         # Execute reboot
         try:
             logging.info("⏰ Executing system reboot NOW due to internet failure...")
-            # Flush all logs before reboot
+            # Flush buffered CSV rows and all logs before reboot
+            self.flush_csv()
             for handler in logging.getLogger().handlers:
                 handler.flush()
             
@@ -1037,20 +1344,22 @@ If you continue to receive these alerts, there may be a persistent network issue
             # Reset counter if reboot fails so we can try again later
             self.consecutive_internet_failures = 0
     
+    @staticmethod
+    def _hysteresis(voltage, low, high, connected, on_reason, off_reason):
+        """Charge at or below low, stop at or above high, otherwise keep the current state"""
+        if voltage <= low:
+            return True, on_reason
+        if voltage >= high:
+            return False, off_reason
+        return (True, on_reason) if connected else (False, off_reason)
+    
     def _camping_mode_logic(self, voltage, threshold):
-        """Simple camping logic with hysteresis"""
-        # Hysteresis: Disconnect at threshold, reconnect 0.5V below
+        """Simple camping logic: disconnect at threshold, charge anywhere below it"""
+        # A disconnected charger is allowed straight back on below the threshold,
+        # so there is no band in which it is held off
         if voltage >= threshold:
             return False, f"CAMPING_HIGH_VOLTAGE_{threshold}V"
-        elif voltage <= (threshold - 0.5) or not self.charger_connected:
-            # Charge if below threshold or if already charging and not too high
-            return True, "CAMPING_ALLOW_CHARGING"
-        else:
-            # In hysteresis band - maintain current state
-            if self.charger_connected:
-                return True, "CAMPING_ALLOW_CHARGING"
-            else:
-                return False, f"CAMPING_HYSTERESIS_{threshold}V"
+        return True, "CAMPING_ALLOW_CHARGING"
         
     def should_charge(self, voltage):
         """Determine if charging should be enabled based on voltage priority and other factors"""
@@ -1077,12 +1386,16 @@ If you continue to receive these alerts, there may be a persistent network issue
         if voltage <= EMERGENCY_VOLTAGE_THRESHOLD:
             return True, "EMERGENCY_LOW_VOLTAGE"
         
-        # Get current hour for time-based logic
-        current_hour = datetime.now().hour
+        # Get current hour for time-based logic - every hour-based flag is looked up once here
+        now = self.current_datetime()
+        current_hour, is_weekend, month = self._clock_key()
+        period = HOUR_PERIOD[current_hour]
+        in_preferred_hours = is_preferred_hour(current_hour, is_weekend)
+        in_avoid_hours = is_avoid_hour(current_hour, is_weekend)
         
         # EV credit hours (12AM-6AM) - always charge (cheapest rates)
         # But stop if voltage gets too high
-        if 0 <= current_hour < 6:
+        if period == 'ev_credit':
             if voltage >= NORMAL_VOLTAGE_THRESHOLD:  # 23.5V - stop if fully charged
                 return False, "EV_CREDIT_VOLTAGE_HIGH"
             return True, "EV_CREDIT_PRIORITY"
@@ -1097,48 +1410,29 @@ If you continue to receive these alerts, there may be a persistent network issue
         
         # Morning after EV credit (6AM-10AM) - disconnect if voltage is healthy AND no solar
         # This prevents continuing to charge at off-peak rates when voltage is already good
-        if 6 <= current_hour < 10:
+        if period == 'morning':
             # Hysteresis: Start at ≤20.7V, stop at ≥22.0V
-            if voltage <= LOW_VOLTAGE_PRIORITY_THRESHOLD:  # 20.7V
-                return True, "MORNING_LOW_VOLTAGE_CHARGE"
-            elif voltage >= (LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.3):  # 22.0V
-                return False, "MORNING_WAIT_FOR_SOLAR"
-            else:
-                # In hysteresis band (20.7V - 22.0V) - maintain current state
-                if self.charger_connected:
-                    return True, "MORNING_LOW_VOLTAGE_CHARGE"
-                else:
-                    return False, "MORNING_WAIT_FOR_SOLAR"
+            return self._hysteresis(voltage, LOW_VOLTAGE_PRIORITY_THRESHOLD,
+                                    LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.3, self.charger_connected,
+                                    "MORNING_LOW_VOLTAGE_CHARGE", "MORNING_WAIT_FOR_SOLAR")
         
         # Evening (8PM-11:59PM) - wait for EV credit unless voltage drops significantly
         # This check must come BEFORE LOW_VOLTAGE_PRIORITY to enforce the wait threshold
         # IMPORTANT: This completely overrides LOW_VOLTAGE_PRIORITY during evening hours
-        if 20 <= current_hour <= 23:
+        if period == 'evening':
             # Start charging: Only if voltage ≤ 20.5V
             # Stop charging: When voltage ≥ 21.5V (1V hysteresis band)
-            
-            if voltage <= EVENING_EV_WAIT_THRESHOLD:  # 20.5V
-                # Voltage is low enough - charge
-                return True, "EVENING_LOW_VOLTAGE_CHARGE"
-            elif voltage >= (EVENING_EV_WAIT_THRESHOLD + 1.0):  # 21.5V
-                # Voltage is high enough - stop charging
-                return False, "WAITING_FOR_EV_CREDIT_PERIOD"
-            else:
-                # Voltage is in the hysteresis band (20.5V - 21.5V)
-                # On first decision after startup, enforce strict threshold
-                if self.first_decision:
-                    return False, "WAITING_FOR_EV_CREDIT_PERIOD"
-                # Otherwise, maintain current state to prevent toggling
-                if self.charger_connected:
-                    return True, "EVENING_LOW_VOLTAGE_CHARGE"
-                else:
-                    return False, "WAITING_FOR_EV_CREDIT_PERIOD"
+            # On first decision after startup, enforce strict threshold inside the band
+            return self._hysteresis(voltage, EVENING_EV_WAIT_THRESHOLD,
+                                    EVENING_EV_WAIT_THRESHOLD + 1.0,
+                                    self.charger_connected and not self.first_decision,
+                                    "EVENING_LOW_VOLTAGE_CHARGE", "WAITING_FOR_EV_CREDIT_PERIOD")
             
         # Low voltage priority - prefer charging even during peak hours
         # Hysteresis: Start at ≤20.7V, stop at ≥22.0V
         if voltage <= LOW_VOLTAGE_PRIORITY_THRESHOLD:  # 20.7V
             # Only avoid charging during peak if voltage is not too low AND solar isn't active
-            if self.is_avoid_charging_time() and not self.solar_detected:
+            if in_avoid_hours and not self.solar_detected:
                 # Still charge during peak if voltage is getting concerning
                 if voltage <= (LOW_VOLTAGE_PRIORITY_THRESHOLD - 0.2):  # 20.5V
                     return True, "LOW_VOLTAGE_OVERRIDE_PEAK"
@@ -1149,12 +1443,12 @@ If you continue to receive these alerts, there may be a persistent network issue
         elif voltage >= (LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.3) and self.charger_connected:  # 22.0V
             # Stop charging if voltage is high enough
             # BUT: Don't apply this during preferred hours - let that logic handle it
-            if not self.is_preferred_charging_time():
+            if not in_preferred_hours:
                 return False, "LOW_VOLTAGE_CHARGED"
         
         # Daily reboot to prevent system lockups
         # Check if it's the reboot hour (this will trigger once per day during the reboot hour)
-        if DAILY_REBOOT_ENABLED and current_hour == DAILY_REBOOT_HOUR and datetime.now().minute < 5:
+        if DAILY_REBOOT_ENABLED and current_hour == DAILY_REBOOT_HOUR and now.minute < 5:
             # schedule_reboot() will exit the script after issuing reboot command
             # This code will not return if reboot succeeds
             self.schedule_reboot()
@@ -1162,60 +1456,35 @@ If you continue to receive these alerts, there may be a persistent network issue
             return self.charger_connected, "REBOOT_FAILED_MAINTAIN_STATE"
         
         # Weekend logic - applies regardless of voltage level (but still safe)
-        if self.is_weekend_or_holiday():
-            if self.charger_connected:
-                # If currently charging, keep charging until voltage gets higher
-                if voltage < (LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.0):  # 22.0V - Higher threshold to stop charging
-                    return True, "WEEKEND_LOW_VOLTAGE"
-                else:
-                    return False, "WEEKEND_WAIT_FOR_EV_CREDIT"
-            else:
-                # If currently not charging, only start if voltage is lower
-                if voltage <= (LOW_VOLTAGE_PRIORITY_THRESHOLD + 0.2):  # 21.2V - Lower threshold to start charging
-                    return True, "WEEKEND_LOW_VOLTAGE"
-                else:
-                    return False, "WEEKEND_WAIT_FOR_EV_CREDIT"
+        if is_weekend:
+            # Start charging at 21.2V, keep charging until 22.0V
+            return self._hysteresis(voltage, LOW_VOLTAGE_PRIORITY_THRESHOLD + 0.2,
+                                    LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.0, self.charger_connected,
+                                    "WEEKEND_LOW_VOLTAGE", "WEEKEND_WAIT_FOR_EV_CREDIT")
         
         # If voltage is healthy (>21.5V), use smart charging logic
         if voltage > EMAIL_RECOVERY_VOLTAGE_THRESHOLD:  # 21.5V
             # Preferred charging hours (now only EV credit on weekends)
-            if self.is_preferred_charging_time():
-                # Add hysteresis to prevent toggling with LOW_VOLTAGE_CHARGED
-                if self.charger_connected:
-                    # Keep charging until 23.5V
-                    if voltage < NORMAL_VOLTAGE_THRESHOLD:  # 23.5V
-                        return True, "PREFERRED_HOURS"
-                    else:
-                        return False, "VOLTAGE_HIGH_SKIP_PREFERRED"
-                else:
-                    # Only start charging if voltage dropped below 22.5V
-                    if voltage <= (LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.8):  # 22.5V
-                        return True, "PREFERRED_HOURS"
-                    else:
-                        return False, "VOLTAGE_HIGH_SKIP_PREFERRED"
+            if in_preferred_hours:
+                # Add hysteresis to prevent toggling with LOW_VOLTAGE_CHARGED:
+                # start below 22.5V, keep charging until 23.5V
+                return self._hysteresis(voltage, LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.8,
+                                        NORMAL_VOLTAGE_THRESHOLD, self.charger_connected,
+                                        "PREFERRED_HOURS", "VOLTAGE_HIGH_SKIP_PREFERRED")
             
             # Daylight hours (potential solar) - charge if voltage reasonable (with hysteresis)
-            start_hour, end_hour = self.get_monthly_daylight_hours()
-            if start_hour <= current_hour < end_hour:
-                if self.charger_connected:
-                    # Keep charging until higher voltage
-                    if voltage < NORMAL_VOLTAGE_THRESHOLD:  # 23.5V
-                        return True, "DAYLIGHT_HOURS_POTENTIAL_SOLAR"
-                    else:
-                        return False, "VOLTAGE_HIGH_SKIP_DAYLIGHT"
-                else:
-                    # Start charging at lower voltage
-                    if voltage <= VOLTAGE_HEALTHY_THRESHOLD:  # 23.0V
-                        return True, "DAYLIGHT_HOURS_POTENTIAL_SOLAR"
-                    else:
-                        return False, "VOLTAGE_HIGH_SKIP_DAYLIGHT"
+            if is_daylight_hour(month, current_hour):
+                # Start charging at 23.0V, keep charging until 23.5V
+                return self._hysteresis(voltage, VOLTAGE_HEALTHY_THRESHOLD,
+                                        NORMAL_VOLTAGE_THRESHOLD, self.charger_connected,
+                                        "DAYLIGHT_HOURS_POTENTIAL_SOLAR", "VOLTAGE_HIGH_SKIP_DAYLIGHT")
             
             # Peak avoidance hours (5PM-8PM) - be conservative
-            if self.is_avoid_charging_time():
+            if in_avoid_hours:
                 return False, "PEAK_RATE_AVOIDANCE"
             
             # Evening (8PM-11:59PM) - wait for EV credit unless voltage drops significantly
-            if 20 <= current_hour <= 23:
+            if period == 'evening':
                 if voltage > (LOW_VOLTAGE_PRIORITY_THRESHOLD + 1.2):  # 22.2V - be more willing to wait for EV credit
                     return False, "WAITING_FOR_EV_CREDIT_PERIOD"
             
@@ -1234,7 +1503,7 @@ If you continue to receive these alerts, there may be a persistent network issue
                 return False, "HYSTERESIS_STAY_DISCONNECTED"
             
         # Fallback: Check time-based preferences (should rarely reach here)
-        if self.is_preferred_charging_time():
+        if in_preferred_hours:
             return True, "FALLBACK_PREFERRED_HOURS"
             
         # Default: maintain current state
@@ -1242,52 +1511,166 @@ If you continue to receive these alerts, there may be a persistent network issue
         
     def get_voltage_status(self, voltage):
         """Get human-readable voltage status (ASCII-only)"""
-        if voltage <= CRITICAL_VOLTAGE_THRESHOLD:
-            return "CRITICAL"
-        elif voltage <= EMERGENCY_VOLTAGE_THRESHOLD:
-            return "EMERGENCY"
-        elif voltage <= LOW_VOLTAGE_PRIORITY_THRESHOLD:
-            return "LOW"
-        elif voltage <= NORMAL_VOLTAGE_THRESHOLD:
-            return "NORMAL"
-        else:
-            return "HIGH"
+        # bisect_left: a voltage equal to a threshold belongs to that threshold's band
+        return VOLTAGE_STATUSES[bisect.bisect_left(VOLTAGE_STATUS_THRESHOLDS, voltage)]
             
-    def send_email_notification(self, subject, message, is_critical=False):
-        """Send email notification for voltage alerts"""
+    def load_alert_state(self):
+        """Alert cache saved by the last run, so a restart doesn't resend alerts still cooling down"""
+        try:
+            with open(ALERT_STATE_FILE) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not load alert state from {ALERT_STATE_FILE}: {e}")
+            return {}
+        
+        # Anything older than a day is past every cooldown and too old to report recovery from
+        cutoff = time.time() - 86400
+        return {category: (last_sent, 0) for category, last_sent in saved.items()
+                if isinstance(last_sent, (int, float)) and last_sent > cutoff}
+    
+    def save_alert_state(self):
+        """Write category -> last sent timestamp atomically (temp file + rename)"""
+        state = {category: last_sent for category, (last_sent, _) in dict(self.alert_cache).items()}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(ALERT_STATE_FILE), suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, ALERT_STATE_FILE)
+        except OSError as e:
+            logging.warning(f"Could not save alert state to {ALERT_STATE_FILE}: {e}")
+    
+    def alert_due(self, category, cooldown=EMAIL_COOLDOWN_MINUTES * 60):
+        """True if an alert of this category may be sent now; counts it as a repeat if not"""
+        last_sent, suppressed = self.alert_cache.get(category, (None, 0))
+        if last_sent is None or time.time() - last_sent > cooldown:
+            return True
+        self.alert_cache[category] = (last_sent, suppressed + 1)
+        return False
+    
+    def alert_sent_within(self, category, seconds):
+        """True if an alert of this category went out in the last `seconds` (no repeat counted)"""
+        last_sent, _ = self.alert_cache.get(category, (None, 0))
+        return last_sent is not None and time.time() - last_sent < seconds
+    
+    def mark_alert_sent(self, category):
+        """Start the cooldown for a category"""
+        self.alert_cache[category] = (time.time(), 0)
+        self.save_alert_state()
+    
+    def clear_alert(self, *categories):
+        """Forget categories whose condition has cleared (the next occurrence alerts at once)"""
+        cleared = [self.alert_cache.pop(category, None) for category in categories]
+        if any(cleared):
+            self.save_alert_state()
+    
+    def send_alert(self, category, subject, message, is_critical=False):
+        """Queue an alert email for a category, noting repeats suppressed since the last one"""
+        last_sent, suppressed = self.alert_cache.get(category, (None, 0))
+        if suppressed:
+            minutes = (time.time() - last_sent) / 60
+            message += f"\n({suppressed} repeat alerts suppressed in the last {minutes:.0f} minutes)\n"
+        # Cooldown starts now; the sender clears the category again if the email fails
+        self.mark_alert_sent(category)
+        if self.queue_email(subject, message, is_critical=is_critical, category=category):
+            return True
+        self.clear_alert(category)
+        return False
+    
+    def send_recovery(self, subject, message, *categories):
+        """Queue a recovery email for alert categories and clear them; the sender restores them if it fails"""
+        cleared = {category: self.alert_cache[category] for category in categories if category in self.alert_cache}
+        self.clear_alert(*categories)
+        if self.queue_email(subject, message, restore=cleared):
+            return True
+        self.restore_alerts(cleared)
+        return False
+    
+    def restore_alerts(self, entries):
+        """Put back alert categories cleared for a recovery email that was not sent"""
+        for category, entry in entries.items():
+            self.alert_cache.setdefault(category, entry)  # A newer alert since then wins
+        self.save_alert_state()
+    
+    def queue_email(self, subject, message, is_critical=False, category=None, restore=None):
+        """Hand an email to the sender thread - False if notifications are off or it was dropped"""
+        if not EMAIL_NOTIFICATIONS_ENABLED:
+            return False
+        
+        # The status block is taken here, on the monitor thread that owns the
+        # voltage history - the sender thread only formats and sends
+        email = (0 if is_critical else 1, next(self.email_sequence),
+                 (subject, message, is_critical, category, restore, self.email_status()))
+        try:
+            if is_critical:
+                # Critical emails wait briefly for room rather than being dropped
+                self.email_queue.put(email, timeout=5)
+            else:
+                self.email_queue.put_nowait(email)
+            return True
+        except queue.Full:
+            logging.warning(f"Email queue full - dropping email: {clean_ascii(subject)}")
+            return False
+    
+    def email_worker(self):
+        """Send queued emails one at a time (runs on its own thread)"""
+        while True:
+            _, _, (subject, message, is_critical, category, restore, status) = self.email_queue.get()
+            try:
+                if not self.send_email_notification(subject, message, is_critical, status):
+                    # Not sent - let the alert (or its recovery) fire again on the next check
+                    if category:
+                        self.clear_alert(category)
+                    if restore:
+                        self.restore_alerts(restore)
+            except Exception as e:
+                logging.error(f"Email sender error: {e}")
+            finally:
+                self.email_queue.task_done()
+    
+    def flush_emails(self, timeout):
+        """Wait up to timeout seconds for queued emails to be sent; True if the queue drained"""
+        deadline = time.monotonic() + timeout
+        with self.email_queue.all_tasks_done:
+            while self.email_queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.email_queue.all_tasks_done.wait(remaining)
+        return True
+        
+    def email_status(self):
+        """System status block appended to every email (ASCII-safe)"""
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        load_level = self._estimate_current_load_level()
+        voltage_status_clean = clean_ascii(self.get_voltage_status(self.last_voltage))
+        return f"""
+System Status at {current_time}:
+- Battery Voltage: {self.last_voltage:.2f}V {voltage_status_clean}
+- Charger Status: {'Connected' if self.charger_connected else 'DISCONNECTED'}
+- Solar Status: {'Active' if self.solar_detected else 'Inactive'}
+- Load Level: {load_level.title()}
+"""
+    
+    def send_email_notification(self, subject, message, is_critical=False, status=None):
+        """Send email notification for voltage alerts (status: block from email_status(), taken now if omitted)"""
         if not EMAIL_NOTIFICATIONS_ENABLED:
             return False
             
         if not EMAIL_FROM or not EMAIL_PASSWORD or not EMAIL_TO:
             logging.warning("Email notifications enabled but credentials not configured")
             return False
+        
+        # Identical email already sent recently - skip building and sending it again
+        email_key = (subject, message)
+        sent_at = self.recent_emails.get(email_key)
+        if sent_at is not None and time.time() - sent_at < EMAIL_DEDUPE_MINUTES * 60:
+            logging.info(f"Skipping duplicate email: {clean_ascii(subject)}")
+            return True  # Already delivered
             
         try:
-            # Clean all text to ensure ASCII compatibility
-            def clean_ascii(text):
-                # Replace common unicode characters with ASCII equivalents
-                replacements = {
-                    '\xa0': ' ',  # Non-breaking space
-                    '\u2022': '-',  # Bullet point
-                    '\u2013': '-',  # En dash
-                    '\u2014': '-',  # Em dash
-                    '\u2018': "'",  # Left single quote
-                    '\u2019': "'",  # Right single quote
-                    '\u201c': '"',  # Left double quote
-                    '\u201d': '"',  # Right double quote
-                    '🔴': 'CRITICAL',
-                    '🟠': 'EMERGENCY', 
-                    '🟡': 'LOW',
-                    '🟢': 'NORMAL',
-                    '🔵': 'HIGH'
-                }
-                for unicode_char, ascii_char in replacements.items():
-                    text = text.replace(unicode_char, ascii_char)
-                
-                # Remove any remaining non-ASCII characters
-                text = ''.join(char if ord(char) < 128 else '?' for char in text)
-                return text
-            
+            # All text goes through clean_ascii() to ensure ASCII compatibility
             # Create message with unique Message-ID to prevent duplicates
             import uuid
             msg = MIMEMultipart()
@@ -1297,42 +1680,34 @@ If you continue to receive these alerts, there may be a persistent network issue
             msg['Message-ID'] = f"<{uuid.uuid4()}@rv-battery-monitor>"
             
             # Add timestamp and system info to message (ASCII-safe)
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            load_level = self._estimate_current_load_level()
-            voltage_status = self.get_voltage_status(self.last_voltage)
-            voltage_status_clean = clean_ascii(voltage_status)
-            
+            if status is None:
+                status = self.email_status()
             full_message = f"""
 {clean_ascii(message)}
-
-System Status at {current_time}:
-- Battery Voltage: {self.last_voltage:.2f}V {voltage_status_clean}
-- Charger Status: {'Connected' if self.charger_connected else 'DISCONNECTED'}
-- Solar Status: {'Active' if self.solar_detected else 'Inactive'}
-- Load Level: {load_level.title()}
-- Inverter Cutoff: {INVERTER_CUTOFF_VOLTAGE}V
-
-Battery System: {BATTERY_CAPACITY_KWH}kWh capacity
-Typical Load: {TYPICAL_LOAD_KW}kW
-
-This is an automated alert from your RV Battery Monitor.
-            """
-            
-            # Clean the entire message
-            full_message_clean = clean_ascii(full_message)
+""" + status + EMAIL_FOOTER
             
-            msg.attach(MIMEText(full_message_clean, 'plain'))
+            # Every part is ASCII already (the caller's text went through clean_ascii above)
+            msg.attach(MIMEText(full_message, 'plain'))
             
-            # Send email
-            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-            server.starttls()
-            server.login(EMAIL_FROM, EMAIL_PASSWORD)
-            text = msg.as_string()
+            # Send email - serialized straight to bytes (smtplib would otherwise encode the str itself)
+            text = msg.as_bytes()
             
             # Ensure EMAIL_TO is properly handled as a list
             recipients = EMAIL_TO if isinstance(EMAIL_TO, list) else [EMAIL_TO]
-            server.sendmail(EMAIL_FROM, recipients, text)
-            server.quit()
+            with self.smtp_lock:
+                try:
+                    self.smtp_session().sendmail(EMAIL_FROM, recipients, text)
+                except smtplib.SMTPServerDisconnected:
+                    # Server dropped the session between the NOOP and the send - one fresh try
+                    self.close_smtp()
+                    self.smtp_session().sendmail(EMAIL_FROM, recipients, text)
+                self.smtp_last_used = time.time()
+                self.smtp_messages_sent += 1
+            
+            self.recent_emails[email_key] = time.time()
+            self.recent_emails.move_to_end(email_key)
+            while len(self.recent_emails) > 32:
+                self.recent_emails.popitem(last=False)
             
             logging.info(f"Email notification sent: {clean_ascii(subject)}")
             return True
@@ -1341,6 +1716,42 @@ This is an automated alert from your RV Battery Monitor.
             logging.error(f"Failed to send email notification: {e}")
             return False
     
+    def smtp_session(self):
+        """The open SMTP session if the server still answers, otherwise a new logged-in one (hold smtp_lock)"""
+        if self.smtp_connection is not None:
+            # Rotate long-lived sessions, and skip the NOOP on ones the server has likely dropped
+            if (self.smtp_messages_sent < SMTP_MAX_MESSAGES_PER_SESSION
+                    and time.time() - self.smtp_last_used < SMTP_IDLE_SECONDS):
+                try:
+                    if self.smtp_connection.noop()[0] == 250:
+                        return self.smtp_connection
+                except (smtplib.SMTPException, OSError):
+                    pass
+            self.close_smtp()
+        
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10)
+        try:
+            server.starttls()
+            server.login(EMAIL_FROM, EMAIL_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        self.smtp_connection = server
+        self.smtp_last_used = time.time()
+        self.smtp_messages_sent = 0
+        return server
+    
+    def close_smtp(self):
+        """Log out of the kept-open SMTP session, if any"""
+        with self.smtp_lock:
+            server, self.smtp_connection = self.smtp_connection, None
+            if server is None:
+                return
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+    
     def test_email_system(self, test_type="basic"):
         """Test email notification system with different scenarios"""
         logging.info(f"🧪 Testing email system: {test_type}")
@@ -1415,14 +1826,9 @@ If you receive this email, your battery monitoring alerts are configured correct
         if not EMAIL_NOTIFICATIONS_ENABLED:
             return
             
-        now = datetime.now()
-        cooldown_period = timedelta(minutes=EMAIL_COOLDOWN_MINUTES)
-        
         # Critical HIGH voltage alert (most urgent - potential damage)
         if voltage >= EMAIL_CRITICAL_HIGH_VOLTAGE_THRESHOLD:
-            if not self.voltage_critical_high_sent or (
-                self.last_email_critical_high and now - self.last_email_critical_high > cooldown_period
-            ):
+            if self.alert_due('critical_high'):
                 subject = f"CRITICAL HIGH VOLTAGE ALERT: RV Battery at {voltage:.2f}V - IMMEDIATE ATTENTION REQUIRED!"
                 message = f"""
 CRITICAL HIGH VOLTAGE ALERT!
@@ -1451,16 +1857,11 @@ Current Status:
 This voltage level requires immediate investigation and corrective action.
                 """
                 
-                if self.send_email_notification(subject, message, is_critical=True):
-                    self.last_email_critical_high = now
-                    self.voltage_critical_high_sent = True
-                    self.recovery_email_sent = False  # Reset recovery flag for new alert
+                self.send_alert('critical_high', subject, message, is_critical=True)
                     
         # Critical LOW voltage alert (most urgent)
         if voltage <= EMAIL_CRITICAL_VOLTAGE_THRESHOLD:
-            if not self.voltage_critical_sent or (
-                self.last_email_critical and now - self.last_email_critical > cooldown_period
-            ):
+            if self.alert_due('critical_low'):
                 subject = f"CRITICAL ALERT: RV Battery at {voltage:.2f}V - Immediate Action Required!"
                 message = f"""
 CRITICAL BATTERY ALERT!
@@ -1476,16 +1877,13 @@ IMMEDIATE ACTION REQUIRED:
 Time until inverter shutdown: Approximately {((voltage - INVERTER_CUTOFF_VOLTAGE) / HEAVY_LOAD_VOLTAGE_DROP * 60):.0f} minutes at current load.
                 """
                 
-                if self.send_email_notification(subject, message, is_critical=True):
-                    self.last_email_critical = now
-                    self.voltage_critical_sent = True
-                    self.recovery_email_sent = False  # Reset recovery flag for new alert
+                self.send_alert('critical_low', subject, message, is_critical=True)
                     
         # Regular low voltage alert (only if not already critical)
+        # A critical alert still cooling down already covers a voltage hovering around its threshold
         elif voltage <= EMAIL_ALERT_VOLTAGE_THRESHOLD and voltage > EMAIL_CRITICAL_VOLTAGE_THRESHOLD:
-            if not self.voltage_alert_sent or (
-                self.last_email_alert and now - self.last_email_alert > cooldown_period
-            ):
+            if (not self.alert_sent_within('critical_low', EMAIL_COOLDOWN_MINUTES * 60)
+                    and self.alert_due('low')):
                 subject = f"Low Battery Alert: RV Battery at {voltage:.2f}V"
                 message = f"""
 Low Battery Voltage Alert
@@ -1504,16 +1902,12 @@ Recommended Actions:
 - Monitor voltage closely
                 """
                 
-                if self.send_email_notification(subject, message):
-                    self.last_email_alert = now
-                    self.voltage_alert_sent = True
-                    self.recovery_email_sent = False  # Reset recovery flag for new alert
-
-        # High voltage alert (safety threshold reached)
-        elif voltage >= VOLTAGE_THRESHOLD_HIGH:
-            if not self.voltage_high_sent or (
-                self.last_email_high_voltage and now - self.last_email_high_voltage > cooldown_period
-            ):
+                self.send_alert('low', subject, message)
+
+        # High voltage alert (safety threshold reached, not already critical)
+        elif VOLTAGE_THRESHOLD_HIGH <= voltage < EMAIL_CRITICAL_HIGH_VOLTAGE_THRESHOLD:
+            if (not self.alert_sent_within('critical_high', EMAIL_COOLDOWN_MINUTES * 60)
+                    and self.alert_due('high')):
                 subject = f"HIGH VOLTAGE ALERT: RV Battery at {voltage:.2f}V - Charger Disconnected!"
                 message = f"""
 HIGH VOLTAGE SAFETY ALERT!
@@ -1539,15 +1933,12 @@ No immediate action required - system is operating safely.
 Monitor voltage and ensure it stabilizes below {VOLTAGE_THRESHOLD_HIGH}V.
                 """
                 
-                if self.send_email_notification(subject, message):
-                    self.last_email_high_voltage = now
-                    self.voltage_high_sent = True
-                    self.recovery_email_sent = False  # Reset recovery flag for new alert
+                self.send_alert('high', subject, message)
                     
         # Recovery notification (for both low and high voltage alerts)
         elif EMAIL_RECOVERY_VOLTAGE_THRESHOLD <= voltage < VOLTAGE_THRESHOLD_HIGH:
-            # Recovery from low voltage alerts - SEND ONLY ONCE
-            if (self.voltage_alert_sent or self.voltage_critical_sent) and not self.recovery_email_sent:
+            # Recovery from low voltage alerts - SEND ONLY ONCE (clearing the alert ends it)
+            if 'low' in self.alert_cache or 'critical_low' in self.alert_cache:
                 subject = f"Battery Recovery: RV Battery at {voltage:.2f}V"
                 message = f"""
 Battery Voltage Recovery
@@ -1558,15 +1949,10 @@ The low voltage alert condition has been cleared.
 System is operating normally.
                 """
                 
-                if self.send_email_notification(subject, message):
-                    self.last_email_recovery = now
-                    # Reset alert flags and mark recovery as sent
-                    self.voltage_alert_sent = False
-                    self.voltage_critical_sent = False
-                    self.recovery_email_sent = True
+                self.send_recovery(subject, message, 'low', 'critical_low')
                     
             # Recovery from critical high voltage alert - SEND ONLY ONCE
-            elif self.voltage_critical_high_sent and not self.recovery_email_sent:
+            elif 'critical_high' in self.alert_cache:
                 subject = f"CRITICAL High Voltage Recovery: RV Battery at {voltage:.2f}V"
                 message = f"""
 CRITICAL High Voltage Recovery
@@ -1592,14 +1978,10 @@ RECOMMENDED ACTIONS:
 System has returned to safer operation, but investigation is still recommended.
                 """
                 
-                if self.send_email_notification(subject, message):
-                    self.last_email_recovery = now
-                    # Reset critical high voltage flag and mark recovery as sent
-                    self.voltage_critical_high_sent = False
-                    self.recovery_email_sent = True
+                self.send_recovery(subject, message, 'critical_high')
                     
             # Recovery from regular high voltage alert - SEND ONLY ONCE
-            elif self.voltage_high_sent and not self.recovery_email_sent:
+            elif 'high' in self.alert_cache:
                 subject = f"High Voltage Recovery: RV Battery at {voltage:.2f}V"
                 message = f"""
 High Voltage Recovery
@@ -1614,28 +1996,19 @@ Current Status:
 System has returned to normal charging operation.
                 """
                 
-                if self.send_email_notification(subject, message):
-                    self.last_email_recovery = now
-                    # Reset high voltage flag and mark recovery as sent
-                    self.voltage_high_sent = False
-                    self.recovery_email_sent = True
+                self.send_recovery(subject, message, 'high')
     
     def check_communication_failure(self):
         """Check for prolonged communication failures and send alerts"""
         if not EMAIL_NOTIFICATIONS_ENABLED:
             return
             
-        now = datetime.now()
-        time_since_last_read = time.time() - self.last_successful_voltage_read
+        time_since_last_read = self.current_timestamp() - self.last_successful_voltage_read
         minutes_since_last_read = time_since_last_read / 60
         
-        cooldown_period = timedelta(minutes=EMAIL_COOLDOWN_MINUTES)
-        
         # Critical communication failure (30+ minutes)
         if minutes_since_last_read >= COMM_FAILURE_CRITICAL_MINUTES:
-            if not self.comm_failure_sent or (
-                self.last_email_comm_failure and now - self.last_email_comm_failure > cooldown_period
-            ):
+            if self.alert_due('comm_failure'):
                 subject = f"CRITICAL: Battery Monitor Communication Failure - {minutes_since_last_read:.0f} Minutes!"
                 message = f"""
 CRITICAL COMMUNICATION FAILURE!
@@ -1669,15 +2042,11 @@ WARNING: Without voltage monitoring, the system cannot:
 Please investigate and restore communication immediately!
                 """
                 
-                if self.send_email_notification(subject, message, is_critical=True):
-                    self.last_email_comm_failure = now
-                    self.comm_failure_sent = True
+                self.send_alert('comm_failure', subject, message, is_critical=True)
                     
         # Initial communication failure alert (10+ minutes)
         elif minutes_since_last_read >= COMM_FAILURE_ALERT_MINUTES:
-            if not self.comm_failure_sent or (
-                self.last_email_comm_failure and now - self.last_email_comm_failure > cooldown_period
-            ):
+            if self.alert_due('comm_failure'):
                 subject = f"Battery Monitor Communication Issue - {minutes_since_last_read:.0f} Minutes"
                 message = f"""
 Battery Monitor Communication Alert
@@ -1701,12 +2070,10 @@ If this persists beyond {COMM_FAILURE_CRITICAL_MINUTES} minutes, immediate atten
 Monitor the situation and check connections if convenient.
                 """
                 
-                if self.send_email_notification(subject, message):
-                    self.last_email_comm_failure = now
-                    self.comm_failure_sent = True
+                self.send_alert('comm_failure', subject, message)
         
         # Recovery notification
-        elif self.comm_failure_sent and minutes_since_last_read < 2:  # Communication restored
+        elif 'comm_failure' in self.alert_cache and minutes_since_last_read < 2:  # Communication restored
             subject = f"Battery Monitor Communication Restored"
             message = f"""
 Communication Recovery
@@ -1723,8 +2090,7 @@ All monitoring and safety features have been restored.
 Normal battery monitoring operation has resumed.
             """
             
-            if self.send_email_notification(subject, message):
-                self.comm_failure_sent = False  # Reset flag after recovery
+            self.send_recovery(subject, message, 'comm_failure')  # Next failure alerts immediately
         
     def control_charger(self, should_connect, reason):
         """Control charger connection via relay"""
@@ -1757,15 +2123,16 @@ Normal battery monitoring operation has resumed.
         
         # Check if we have 4+ toggles within 5 minutes (300 seconds)
         # With proper hysteresis, ANY rapid toggling indicates a logic problem
-        now = time.time()
-        recent_changes = [change for change in self.charger_state_changes if now - change[0] <= 300]
+        # Changes are appended in time order, so expired ones are always at the left end
+        now = self.current_timestamp()
+        while self.charger_state_changes and now - self.charger_state_changes[0][0] > 300:
+            self.charger_state_changes.popleft()
+        recent_changes = self.charger_state_changes
         
         if len(recent_changes) >= 4:
             # Rapid toggling detected!
             # Only send alert once per hour to avoid spam
-            if self.last_rapid_toggle_alert is None or (now - self.last_rapid_toggle_alert) > 3600:
-                self.last_rapid_toggle_alert = now
-                
+            if self.alert_due('rapid_toggle', cooldown=3600):
                 # Build toggle history for email
                 toggle_history = []
                 for timestamp, state, reason in recent_changes:
@@ -1804,16 +2171,21 @@ This alert will not repeat for 1 hour to avoid spam.
                 """
                 
                 logging.warning(f"⚠️ RAPID TOGGLING DETECTED: {len(recent_changes)} changes in 5 minutes")
-                self.send_email_notification(subject, message)
+                self.send_alert('rapid_toggle', subject, message)
             
     def log_detailed_status(self, voltage):
         """Log detailed system status periodically"""
-        now = time.time()
+        now = self.current_timestamp()
         if now - self.last_detailed_log < LOG_INTERVAL:
             return
             
         self.last_detailed_log = now
-        current_time = datetime.now().strftime("%H:%M")
+        # Nothing below is needed if INFO records would be dropped anyway
+        if not logging.getLogger().isEnabledFor(logging.INFO):
+            return
+        now_dt = self.current_datetime()
+        current_time = now_dt.strftime("%H:%M")
+        month = now_dt.month
         rate_type, current_rate, has_ev_credit = self.get_current_rate_info()
         load_level = self._estimate_current_load_level()
         
@@ -1822,29 +2194,64 @@ This alert will not repeat for 1 hour to avoid spam.
             current_capacity_pct = min(100, max(0, (voltage - 20.0) / 5.2 * 100))  # Rough estimate
             current_capacity_kwh = BATTERY_CAPACITY_KWH * (current_capacity_pct / 100)
             
-            load_kw_estimate = {
-                "minimal": 0.1, "light": 0.5, "typical": 1.0, "heavy": 1.5, "unknown": 1.0
-            }.get(load_level, 1.0)
+            load_kw_estimate = LOAD_KW_BY_LEVEL.get(load_level, 1.0)
             
             estimated_runtime = current_capacity_kwh / load_kw_estimate if load_kw_estimate > 0 else 0
         else:
             estimated_runtime = 0
             current_capacity_pct = 0
         
+        # Rolling summary of the voltage history window (the deques kept for solar
+        # detection) - C-level builtins over the bounded window, once per LOG_INTERVAL
+        window = self.history_voltages
+        if window:
+            window_minutes = (self.history_times[-1] - self.history_times[0]) / 60
+            window_msg = (f"Window: {fmean(window):.2f}V avg, {min(window):.2f}-{max(window):.2f}V "
+                          f"over {window_minutes:.0f}min | ")
+        else:
+            window_msg = ""
+        
         status_msg = (
             f"📊 DETAILED STATUS [{current_time}] - "
             f"Voltage: {voltage:.2f}V ({current_capacity_pct:.0f}%) | "
             f"Est. Runtime: {estimated_runtime:.1f}h | "
+            f"{window_msg}"
             f"Load: {load_level} | "
             f"Charger: {'Connected' if self.charger_connected else 'DISCONNECTED'} | "
             f"Solar: {'Active' if self.solar_detected else 'Inactive'} | "
             f"Rate: {current_rate:.1f}¢/kWh ({rate_type}) | "
             f"EV Credit: {'Yes' if has_ev_credit else 'No'} | "
-            f"Season: {self.get_monthly_season_name()} (Solar: {self.get_solar_factor():.0%})"
+            f"Season: {SEASON_NAME_BY_MONTH[month]} (Solar: {SOLAR_FACTOR_BY_MONTH[month]:.0%})"
         )
         
         logging.info(status_msg)
         
+    def update_monitor_interval(self, voltage, previous_voltage, state_changed):
+        """Double the check interval after a run of steady reads; back to normal on any change"""
+        steady = (voltage is not None and previous_voltage and not state_changed
+                  and abs(voltage - previous_voltage) < STABLE_VOLTAGE_DELTA
+                  # Never back off near the emergency or safety cutoffs
+                  and EMERGENCY_VOLTAGE_THRESHOLD < voltage < VOLTAGE_THRESHOLD_LOW)
+        if not steady:
+            if self.monitor_interval != MONITOR_INTERVAL:
+                logging.info(f"⏱️ Voltage changing - checking every {MONITOR_INTERVAL}s again")
+            self.stable_reads = 0
+            self.monitor_interval = MONITOR_INTERVAL
+            return
+        
+        self.stable_reads += 1
+        if self.stable_reads >= STABLE_READS_BEFORE_BACKOFF and self.monitor_interval < MONITOR_INTERVAL_MAX:
+            self.monitor_interval = min(self.monitor_interval * 2, MONITOR_INTERVAL_MAX)
+            logging.info(f"⏱️ Voltage steady - checking every {self.monitor_interval}s")
+    
+    def sleep_interval(self):
+        """Seconds until the next check - a backed-off interval still wakes on the hour"""
+        if self.monitor_interval <= MONITOR_INTERVAL or self.tick_now is None:
+            return MONITOR_INTERVAL
+        # Rates, schedules and the daily reboot window all change on the hour
+        seconds_to_hour = 3600 - (self.tick_now.minute * 60 + self.tick_now.second)
+        return max(MONITOR_INTERVAL, min(self.monitor_interval, seconds_to_hour))
+    
     def monitor_loop(self):
         """Main monitoring loop with smart charging logic"""
         
@@ -1858,19 +2265,11 @@ This alert will not repeat for 1 hour to avoid spam.
             logging.info("📵 All smart charging features DISABLED - Simple high voltage protection only")
             
             # Show upcoming camping periods
-            if len(CAMPING_PERIODS) > 1:
-                from datetime import datetime, date
+            if len(self.camping_periods) > 1:
                 today = date.today()
-                upcoming = []
-                for period in CAMPING_PERIODS:
-                    start_str, end_str = period[:2]
-                    try:
-                        start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
-                        end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
-                        if start_date > today:
-                            upcoming.append(f"{start_str} to {end_str}")
-                    except ValueError:
-                        continue
+                upcoming = [f"{start_date} to {end_date}"
+                            for start_date, end_date, _ in self.camping_periods
+                            if start_date > today]
                 if upcoming:
                     logging.info(f"📅 Upcoming camping periods: {', '.join(upcoming[:2])}")
         else:
@@ -1883,28 +2282,31 @@ This alert will not repeat for 1 hour to avoid spam.
             logging.info(f"🚫 Peak avoid hours: {AVOID_CHARGING_HOURS}")
             logging.info(f"☀️ Solar detection: {'Enabled' if SOLAR_DETECTION_ENABLED else 'Disabled'}")
             logging.info(f"🌐 Internet health check: {'Enabled' if INTERNET_HEALTH_CHECK_ENABLED else 'Disabled'} (Reset after {INTERNET_FAILURE_THRESHOLD} failures)")
-            logging.info(f"📅 Current season: {self.get_monthly_season_name()} (Solar factor: {self.get_solar_factor():.0%}, Daylight: {self.get_monthly_daylight_hours()[0]}:00-{self.get_monthly_daylight_hours()[1]}:00)")
+            month = datetime.now().month
+            daylight_start, daylight_end = DAYLIGHT_BY_MONTH[month]
+            logging.info(f"📅 Current season: {SEASON_NAME_BY_MONTH[month]} (Solar factor: {SOLAR_FACTOR_BY_MONTH[month]:.0%}, Daylight: {daylight_start}:00-{daylight_end}:00)")
             
             # Show next camping period if any
-            if CAMPING_PERIODS:
-                from datetime import datetime, date
+            if self.camping_periods:
                 today = date.today()
-                next_camping = None
-                for period in CAMPING_PERIODS:
-                    start_str, end_str = period[:2]
-                    try:
-                        start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
-                        if start_date > today:
-                            if next_camping is None or start_date < next_camping[0]:
-                                next_camping = (start_date, start_str, end_str)
-                    except ValueError:
-                        continue
-                if next_camping:
-                    logging.info(f"🏕️ Next camping period: {next_camping[1]} to {next_camping[2]}")
+                upcoming = [period for period in self.camping_periods if period[0] > today]
+                if upcoming:
+                    start_date, end_date, _ = min(upcoming)
+                    logging.info(f"🏕️ Next camping period: {start_date} to {end_date}")
+        
+        # Only the monitor arms the daily reset (not the test-inverter mode)
+        self.schedule_inverter_reset()
         
         try:
             while True:
+                previous_voltage = self.last_voltage
+                previous_state = (self.charger_connected, self.solar_detected)
                 voltage = self.read_voltage()
+                self.tick_ts = time.time()
+                self.tick_now = datetime.fromtimestamp(self.tick_ts)
+                
+                # Daily inverter reset, if the timer has flagged it
+                self.reset_inverter_if_due()
                 
                 if voltage is not None:
                     # Check for voltage alerts and send emails if needed
@@ -1919,9 +2321,6 @@ This alert will not repeat for 1 hour to avoid spam.
                     # Detect solar activity
                     self.detect_solar_charging()
                     
-                    # Check if inverter needs daily reset
-                    self.reset_inverter_if_needed()
-                    
                     # Get current rate info
                     rate_type, current_rate, has_ev_credit = self.get_current_rate_info()
                     
@@ -1946,9 +2345,9 @@ This alert will not repeat for 1 hour to avoid spam.
                     ev_credit_status = "💰" if has_ev_credit else ""
                     voltage_status = self.get_voltage_status(voltage)
                     
-                    logging.info(f"{solar_status}{ev_credit_status} {voltage:.2f}V {voltage_status} - "
-                               f"Charger: {charger_status} ({reason}) - "
-                               f"Rate: {current_rate:.1f}¢/kWh")
+                    logging.info("%s%s %.2fV %s - Charger: %s (%s) - Rate: %.1f¢/kWh",
+                                 solar_status, ev_credit_status, voltage, voltage_status,
+                                 charger_status, reason, current_rate)
                     
                     # Detailed periodic logging
                     self.log_detailed_status(voltage)
@@ -1960,7 +2359,13 @@ This alert will not repeat for 1 hour to avoid spam.
                     # Check internet connectivity even when voltage read fails
                     self.check_internet_health()
                     
-                time.sleep(MONITOR_INTERVAL)
+                state_changed = (self.charger_connected, self.solar_detected) != previous_state
+                self.update_monitor_interval(voltage, previous_voltage, state_changed)
+                interval = self.sleep_interval()
+                self.tick_now = None
+                self.flush_log()
+                # Sleeps like time.sleep(interval) but wakes early when the reset timer fires
+                self.inverter_reset_due.wait(interval)
                 
         except KeyboardInterrupt:
             logging.info("Monitoring stopped by user")
@@ -1972,6 +2377,10 @@ This alert will not repeat for 1 hour to avoid spam.
     def cleanup(self):
         """Clean up GPIO and serial connections"""
         try:
+            # No daily inverter reset once we're shutting down
+            if self.inverter_reset_timer is not None:
+                self.inverter_reset_timer.cancel()
+            
             # Force charger connection and inverter ON before cleanup
             logging.info("Cleanup starting - forcing charger connection and inverter ON")
             GPIO.output(RELAY_PIN, GPIO.LOW)  # Ensure charger connected
@@ -1982,6 +2391,13 @@ This alert will not repeat for 1 hour to avoid spam.
             GPIO.cleanup()
             logging.info("GPIO cleanup completed")
             
+            # Write out any buffered CSV rows
+            self.close_csv()
+            
+            # Let queued alert emails go out before closing the SMTP session
+            self.flush_emails(timeout=30)
+            self.close_smtp()
+            
             # Close serial connection
             if hasattr(self, 'ser'):
                 self.ser.close()
@@ -5,6 +5,8 @@ Test email notifications for battery monitor
 
 import sys
 import os
+from collections import OrderedDict
+import threading
 sys.path.append('/home/erictran/Script')
 
 from config import *
@@ -42,16 +44,13 @@ def test_email_alerts():
             def __init__(self):
                 self.charger_connected = True
                 self.solar_detected = False
+                self.recent_emails = OrderedDict()
+                self.smtp_connection = None
+                self.smtp_lock = threading.RLock()
+                self.smtp_last_used = 0
+                self.smtp_messages_sent = 0
                 self.last_voltage = 0.0
-                self.voltage_alert_sent = False
-                self.voltage_critical_sent = False
-                self.voltage_high_sent = False
-                self.voltage_critical_high_sent = False
-                self.last_email_alert = None
-                self.last_email_critical = None
-                self.last_email_high_voltage = None
-                self.last_email_critical_high = None
-                self.last_email_recovery = None
+                self.alert_cache = {}
             
             # Add missing methods that email system depends on
             def _estimate_current_load_level(self):
@@ -70,21 +69,47 @@ def test_email_alerts():
                     return "HIGH"
             
             # Import the email methods from SmartBatteryMonitor
+            def smtp_session(self):
+                return SmartBatteryMonitor.smtp_session(self)
+            
+            def close_smtp(self):
+                return SmartBatteryMonitor.close_smtp(self)
+            
+            email_status = SmartBatteryMonitor.email_status
+            
             def send_email_notification(self, subject, message, is_critical=False):
                 return SmartBatteryMonitor.send_email_notification(self, subject, message, is_critical)
             
             def check_voltage_alerts(self, voltage):
                 return SmartBatteryMonitor.check_voltage_alerts(self, voltage)
+            
+            alert_due = SmartBatteryMonitor.alert_due
+            alert_sent_within = SmartBatteryMonitor.alert_sent_within
+            mark_alert_sent = SmartBatteryMonitor.mark_alert_sent
+            clear_alert = SmartBatteryMonitor.clear_alert
+            send_alert = SmartBatteryMonitor.send_alert
+            send_recovery = SmartBatteryMonitor.send_recovery
+            restore_alerts = SmartBatteryMonitor.restore_alerts
+            
+            # Test alerts leave the monitor's saved alert state alone
+            def save_alert_state(self):
+                pass
+            
+            # No sender thread here - send straight away
+            def queue_email(self, subject, message, is_critical=False, category=None, restore=None):
+                return self.send_email_notification(subject, message, is_critical)
         
         monitor = TestMonitor()
     
     # Test different voltage scenarios (comprehensive test suite)
     test_scenarios = [
+        (24.9, "🟠 High voltage band test (24.85-25V, before any critical alert)"),
         (25.2, "🔴 CRITICAL HIGH voltage test (>25V)"),
         (24.7, "🟠 High voltage test (>24.5V)"),
         (23.0, "🟢 Normal voltage test"),
         (20.9, "🟡 Low voltage test"),
         (20.5, "🔴 CRITICAL LOW voltage test"),
+        (20.2, "🟡 Low voltage band test (20.1-20.3V)"),
         (21.8, "🔵 Recovery test (from low voltage)"),
         (24.2, "🔵 Recovery test (from high voltage)")
     ]
@@ -100,6 +125,8 @@ def test_email_alerts():
         if input("Continue to next test? (y/n): ").lower() != 'y':
             break
     
+    # Log out rather than leave the session for the server to time out
+    monitor.close_smtp()
     print("🎉 Email testing completed!")
 
 def test_single_email():
@@ -116,6 +143,11 @@ def test_single_email():
             def __init__(self):
                 self.charger_connected = True
                 self.solar_detected = False
+                self.recent_emails = OrderedDict()
+                self.smtp_connection = None
+                self.smtp_lock = threading.RLock()
+                self.smtp_last_used = 0
+                self.smtp_messages_sent = 0
                 self.last_voltage = 23.5
             
             # Add missing methods that email system depends on
@@ -134,6 +166,14 @@ def test_single_email():
                 else:
                     return "HIGH"
             
+            def smtp_session(self):
+                return SmartBatteryMonitor.smtp_session(self)
+            
+            def close_smtp(self):
+                return SmartBatteryMonitor.close_smtp(self)
+            
+            email_status = SmartBatteryMonitor.email_status
+            
             def send_email_notification(self, subject, message, is_critical=False):
                 return SmartBatteryMonitor.send_email_notification(self, subject, message, is_critical)
         
@@ -164,6 +204,7 @@ Your battery monitoring system is ready to send alerts.
         )
         
         success = monitor.send_email_notification(subject, message)
+        monitor.close_smtp()
         
         if success:
             print("✅ Test email sent successfully!")
@@ -222,6 +263,11 @@ def test_specific_voltage(voltage, description):
             def __init__(self):
                 self.charger_connected = True
                 self.solar_detected = False
+                self.recent_emails = OrderedDict()
+                self.smtp_connection = None
+                self.smtp_lock = threading.RLock()
+                self.smtp_last_used = 0
+                self.smtp_messages_sent = 0
                 self.last_voltage = voltage
             
             # Add missing methods that email system depends on
@@ -240,6 +286,14 @@ def test_specific_voltage(voltage, description):
                 else:
                     return "HIGH"
             
+            def smtp_session(self):
+                return SmartBatteryMonitor.smtp_session(self)
+            
+            def close_smtp(self):
+                return SmartBatteryMonitor.close_smtp(self)
+            
+            email_status = SmartBatteryMonitor.email_status
+            
             def send_email_notification(self, subject, message, is_critical=False):
                 print(f"📧 Sending email: {subject}")
                 success = SmartBatteryMonitor.send_email_notification(self, subject, message, is_critical)
@@ -339,6 +393,7 @@ If you receive this email, your recovery alerts are working correctly!
         
         # Force send the email
         success = monitor.send_email_notification(subject, message, is_critical=True)
+        monitor.close_smtp()
         
         if success:
             print("✅ Test email sent successfully!")
@@ -34,9 +34,10 @@ try:
     ser = serial.Serial(PORT, baudrate=BAUD_RATE, timeout=2)
 
     while True:
-        line = ser.readline().decode('utf-8', errors='ignore').strip()
-        if line.startswith("V"):
-            mv = int(line.split("\t")[1])   # VE.Direct gives mV
+        # Match the field name on the raw bytes - "V" alone would also match VPV (panel voltage)
+        line = ser.readline()
+        if line.startswith(b'V\t'):
+            mv = int(line[2:])   # VE.Direct gives mV; int() ignores the trailing \r\n
             print(f"{mv/1000:.2f} V")
             break
 except Exception as e: